@@ -70,7 +70,7 @@ def interpolate_background(frame,
         print(tile_centers_vert)
 
     # Build array of tile mean values
-    tile_values = np.empty((n_tiles_vert, n_tiles_horiz), dtype=np.float_)
+    tile_values = np.empty((n_tiles_vert, n_tiles_horiz), dtype=np.float64)
     if debug:
         tile_median = np.empty_like(tile_values)
 
@@ -151,12 +151,12 @@ def segment_frame(frame, bg, conn=2, cell_threshold=1.1):
 
     # Smoothen mask (first erode, then dilate with circle)
     mask = morph.binary_erosion(mask)
-    selem_dil = np.ones((5, 5), dtype=np.bool)
+    selem_dil = np.ones((5, 5), dtype=bool)
     selem_dil[0, 0] = 0
     selem_dil[0, -1] = 0
     selem_dil[-1, 0] = 0
     selem_dil[-1, -1] = 0
-    mask = morph.binary_dilation(mask, selem=selem_dil)
+    mask = morph.binary_dilation(mask, footprint=selem_dil)
 
     # Find clusters
     mask = meas.label(mask, connectivity=conn, return_num=False)
@@ -362,6 +362,11 @@ class ContrastAdjuster:
         self.draw_limit_line()
 
 
+    def settings_key(self):
+        """Get the contrast settings as hashable object, e.g. for caching"""
+        return self.scale_var.get(), self.pmin, self.pmax
+
+
     def convert(self, img):
         """Convert an image to uint8
 
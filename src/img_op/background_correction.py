@@ -7,22 +7,75 @@ https://push-zb.helmholtz-muenchen.de/frontdoor.php?source_opus=6773
 # Based on "background_correction.py"
 # of commit f46236d89b18ec8833e54bbdfe748f3e5bce6924
 # in repository https://gitlab.physik.uni-muenchen.de/lsr-pyama/schwarzfischer
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numbers
+import os
+import warnings
+
 import numpy as np
-import numpy.ma as ma
 import scipy.interpolate as scint
 import scipy.stats as scst
 
 from .. import util
+from ..session.status import DummyStatus
 
 
 def _make_tiles(n, div, name='center'):
     borders = np.rint(np.linspace(0, n, 2*div-1)).astype(np.uint16)
-    tiles = np.empty(len(borders)-2, dtype=[(name, np.float), ('slice', object)])
+    tiles = np.empty(len(borders)-2, dtype=[(name, float), ('slice', object)])
     for i, (b1, b2) in enumerate(zip(borders[:-2], borders[2:])):
         tiles[i] = (b1 + b2) / 2, slice(b1, b2)
     return tiles
 
 
+def _tile_index(tiles, n):
+    """Build an index array for gathering the pixels of tiles.
+
+    Arguments:
+        tiles -- tiles as returned by `_make_tiles`
+        n -- size of the image along the tiled dimension
+
+    Returns an int array of shape (number of tiles, maximum tile size),
+    whose row `i` holds the indices of tile `i`, padded with `n`.
+    """
+    sizes = [sl.stop - sl.start for sl in tiles['slice']]
+    idx = np.full((tiles.size, max(sizes, default=0)), n, dtype=np.intp)
+    for i, sl in enumerate(tiles['slice']):
+        idx[i, :sizes[i]] = np.arange(sl.start, sl.stop)
+    return idx
+
+
+def _tile_medians(frame, mask, idx_vert, idx_horiz, dtype=np.float64):
+    """Calculate the medians of the background of all tiles of a frame.
+
+    Arguments:
+        frame -- (height x width) array, the fluorescence image
+        mask -- boolean array of same shape as `frame`; True for cells
+        idx_vert, idx_horiz -- tile index arrays as returned by `_tile_index`
+        dtype -- float dtype used for calculation
+
+    The tiles are gathered into a NaN-padded array, in which also
+    the cell pixels are NaN, so that the medians of all tiles
+    are calculated with a single call of `np.nanmedian`.
+
+    Returns an array of shape (number of horizontal tiles, number of vertical tiles)
+    with the median of each tile. Tiles without background yield NaN.
+    """
+    height, width = frame.shape
+    padded = np.empty((height + 1, width + 1), dtype=dtype)
+    padded[:height, :width] = frame
+    padded[:height, :width][np.asarray(mask, dtype=bool)] = np.nan
+    padded[height, :] = np.nan
+    padded[:, width] = np.nan
+    blocks = padded[idx_vert[:, np.newaxis, :, np.newaxis], idx_horiz[np.newaxis, :, np.newaxis, :]]
+    blocks = blocks.reshape(*blocks.shape[:2], -1)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        supp = np.nanmedian(blocks, axis=-1)
+    return supp.T
+
+
 def _get_arr(shape, dtype, mem_lim, memmap_dir):
     """Create channel arrays.
 
@@ -84,7 +137,31 @@ def _get_arr(shape, dtype, mem_lim, memmap_dir):
     return arr_interp, arr_temp, iter_temp()
 
 
-def background_schwarzfischer(fluor_chan, bin_chan, div_horiz=7, div_vert=5, mem_lim=None, memmap_dir=None):
+def _fit_background(frame, mask, tiles_vert, tiles_horiz, idx_vert, idx_horiz, dtype_supp):
+    """Fit the background of one frame.
+
+    The background is interpolated as cubic spline with each tile’s
+    median as support point at the tile center.
+    Returns the `RectBivariateSpline` of the background,
+    with x as horizontal and y as vertical coordinate.
+    """
+    supp = _tile_medians(frame, mask, idx_vert, idx_horiz, dtype_supp)
+    return scint.RectBivariateSpline(x=tiles_horiz['center'], y=tiles_vert['center'], z=supp)
+
+
+def _interpolate_frame(frame, mask, tiles_vert, tiles_horiz, idx_vert, idx_horiz, dtype_supp):
+    """Interpolate the background of one frame.
+
+    Returns the interpolated background as (height x width) array,
+    see `_fit_background`.
+    """
+    height, width = frame.shape
+    bg_spline = _fit_background(frame, mask, tiles_vert, tiles_horiz, idx_vert, idx_horiz, dtype_supp)
+    return bg_spline(x=range(width), y=range(height)).T
+
+
+def background_schwarzfischer(fluor_chan, bin_chan, div_horiz=7, div_vert=5, mem_lim=None, memmap_dir=None,
+        status=None, n_workers=None):
     """Perform background correction according to Schwarzfischer et al.
 
     Arguments:
@@ -96,10 +173,15 @@ def background_schwarzfischer(fluor_chan, bin_chan, div_horiz=7, div_vert=5, mem
                 if in (0,1], max percentage of free memory to be used;
                 if non-positive, always use memory; if None, decide automatically
         memmap_dir -- str; directory for creating memmap
+        status -- Status instance for displaying progress
+        n_workers -- number of threads for interpolating the background
+                of the frames in parallel; defaults to the number of CPUs
 
     Returns:
         Background-corrected fluorescence channel as numpy array (dtype single) of same shape as `fluor_chan`
     """
+    if status is None:
+        status = DummyStatus()
     n_frames, height, width = fluor_chan.shape
 
     # Allocate arrays
@@ -113,10 +195,7 @@ def background_schwarzfischer(fluor_chan, bin_chan, div_horiz=7, div_vert=5, mem
     bg_mean = np.empty((n_frames, 1, 1), dtype=dtype_interp)
 
     # Create large arrays in memory or as memmap
-    if mem_lim is None or mem_lim > 0:
-        bg_interp, arr_temp, iter_temp = _get_arr(fluor_chan.shape, dtype_interp, mem_lim, memmap_dir)
-    else:
-        bg_interp, arr_temp, iter_temp = np.empty(shape=fluor_chan.shape, dtype=dtype_interp)
+    bg_interp, arr_temp, iter_temp = _get_arr(fluor_chan.shape, dtype_interp, mem_lim, memmap_dir)
 
     # Construct tiles for background interpolation
     # Each pair of neighboring tiles is overlapped by a third tile, resulting in a total tile number
@@ -124,20 +203,22 @@ def background_schwarzfischer(fluor_chan, bin_chan, div_horiz=7, div_vert=5, mem
     # Due to integer rounding, the sizes may slightly vary between tiles.
     tiles_vert = _make_tiles(height, div_vert)
     tiles_horiz = _make_tiles(width, div_horiz)
-    supp = np.empty((tiles_horiz.size, tiles_vert.size))
-
-    # Interpolate background as cubic spline with each tile’s median as support point at the tile center
-    for t in range(n_frames):
-        print(f"Interpolating background in frame {t:3d} …")
-        masked_frame = ma.masked_array(fluor_chan[t, ...], mask=bin_chan[t, ...])
-        for iy, (y, sy) in enumerate(tiles_vert):
-            for ix, (x, sx) in enumerate(tiles_horiz):
-                supp[ix, iy] = ma.median(masked_frame[sy, sx])
-        bg_spline = scint.RectBivariateSpline(x=tiles_horiz['center'], y=tiles_vert['center'], z=supp)
-        patch = bg_spline(x=range(width), y=range(height)).T
+    idx_vert = _tile_index(tiles_vert, height)
+    idx_horiz = _tile_index(tiles_horiz, width)
+    dtype_supp = np.float32 if np.can_cast(fluor_chan.dtype, np.float32) else np.float64
+
+    # Interpolate background of the frames in parallel
+    def interpolate(t):
+        patch = _interpolate_frame(fluor_chan[t, ...], bin_chan[t, ...], tiles_vert, tiles_horiz,
+                                   idx_vert, idx_horiz, dtype_supp)
         bg_interp[t, ...] = patch
         bg_mean[t, ...] = patch.mean()
 
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    with status("Interpolating background", current=0, total=n_frames) as current_status:
+        _run_parallel(interpolate, n_frames, n_workers, current_status, "Interpolating background")
+
     # Correct for background using Schwarzfischer’s formula:
     #   corrected_image = (raw_image - interpolated_background) / gain
     # wherein, in opposite to Schwarzfischer, the gain is approximated as
@@ -151,3 +232,130 @@ def background_schwarzfischer(fluor_chan, bin_chan, div_horiz=7, div_vert=5, mem
 
     # `bg_interp` now holds the corrected image
     return bg_interp
+
+
+def _run_parallel(fun, n, n_workers, current_status=None, msg=None):
+    """Call `fun(i)` for `i` in `range(n)` in a thread pool.
+
+    If `current_status` is given, progress is reported with message `msg`.
+    """
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(fun, i) for i in range(n)]
+        try:
+            for i, fut in enumerate(as_completed(futures), start=1):
+                fut.result()
+                if current_status is not None:
+                    current_status.reset(msg=msg, current=i, total=n)
+        except BaseException:
+            for fut in futures:
+                fut.cancel()
+            raise
+
+
+def background_schwarzfischer_streaming(fluor_chan, bin_chan, out, div_horiz=7, div_vert=5,
+        mem_lim=None, status=None, n_workers=None):
+    """Perform background correction frame by frame without loading the whole channel.
+
+    Arguments:
+        fluor_chan -- sequence of (height x width) arrays; the frames of the
+                fluorescence channel to be corrected, e.g. a memmap of shape
+                (frames x height x width). Must support `len` and indexing by frame.
+        bin_chan -- sequence of boolean arrays like `fluor_chan`; segmentation map
+                (background=False, cell=True)
+        out -- callable accepting an iterator, which yields the corrected
+                frames (float32) in order, e.g. for writing them to a file
+        div_horiz, div_vert -- like `background_schwarzfischer`
+        mem_lim -- max number of bytes for calculating the gain;
+                if in (0,1], max percentage of free memory to be used;
+                if non-positive, always use memory, i.e. calculate
+                the gain of all rows at once (as in `background_schwarzfischer`);
+                if None, use up to 95 % of the free memory
+        status -- Status instance for displaying progress
+        n_workers -- number of threads; defaults to the number of CPUs
+
+    The result equals that of `background_schwarzfischer` up to rounding,
+    but is calculated in three passes:
+        1. the background of each frame is fitted, keeping only the spline
+           coefficients and the mean background of each frame in memory;
+        2. the gain is calculated from the interpolated backgrounds of all
+           frames in blocks of rows fitting into `mem_lim`;
+        3. the corrected frames are calculated and passed to `out` one by one.
+    Thus, the memory usage is bounded by `mem_lim` and a few frames per thread,
+    independent of the number of frames.
+    """
+    if status is None:
+        status = DummyStatus()
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_frames = len(fluor_chan)
+    if not n_frames:
+        out(iter(()))
+        return
+    frame0 = np.asarray(fluor_chan[0])
+    height, width = frame0.shape
+    dtype_supp = np.float32 if np.can_cast(frame0.dtype, np.float32) else np.float64
+
+    tiles_vert = _make_tiles(height, div_vert)
+    tiles_horiz = _make_tiles(width, div_horiz)
+    idx_vert = _tile_index(tiles_vert, height)
+    idx_horiz = _tile_index(tiles_horiz, width)
+    splines = [None] * n_frames
+    bg_mean = np.empty(n_frames, dtype=np.float64)
+    xs = np.arange(width)
+
+    # Pass 1: fit background of each frame
+    def fit(t):
+        spline = _fit_background(np.asarray(fluor_chan[t]), np.asarray(bin_chan[t]),
+                                 tiles_vert, tiles_horiz, idx_vert, idx_horiz, dtype_supp)
+        splines[t] = spline
+        bg_mean[t] = spline(x=xs, y=np.arange(height)).mean()
+
+    with status("Interpolating background", current=0, total=n_frames) as current_status:
+        _run_parallel(fit, n_frames, n_workers, current_status, "Interpolating background")
+
+    # Pass 2: gain as median of normalized background, in blocks of rows
+    if mem_lim is None:
+        mem_lim = util.mem_avail() * .95
+    elif not isinstance(mem_lim, numbers.Real):
+        raise TypeError(f"Invalid memory limit: {mem_lim!r}")
+    elif 0 < mem_lim <= 1:
+        mem_lim = util.mem_avail() * mem_lim
+    if mem_lim <= 0:
+        block_rows = height
+    else:
+        block_rows = int(min(max(mem_lim // (n_frames * width * 4 * 2), 1), height))
+    gain = np.empty((height, width), dtype=np.float32)
+    row_blocks = [np.arange(y, min(y + block_rows, height)) for y in range(0, height, block_rows)]
+    with status("Calculating gain", current=0, total=len(row_blocks)) as current_status:
+        for i_block, ys in enumerate(row_blocks, start=1):
+            block = np.empty((n_frames, ys.size, width), dtype=np.float32)
+            def eval_block(t):
+                np.divide(splines[t](x=xs, y=ys).T, bg_mean[t], out=block[t])
+            _run_parallel(eval_block, n_frames, n_workers)
+            gain[ys, :] = np.median(block, axis=0)
+            del block
+            current_status.reset(msg="Calculating gain", current=i_block, total=len(row_blocks))
+
+    # Pass 3: correct frames and pass them on in order
+    def correct(t):
+        bg = splines[t](x=xs, y=np.arange(height)).T
+        corr = np.subtract(np.asarray(fluor_chan[t]), bg, dtype=np.float32)
+        return np.divide(corr, gain, out=corr)
+
+    def iter_corrected(executor, current_status):
+        futures = deque()
+        t_next = 0
+        try:
+            for t in range(n_frames):
+                while t_next < n_frames and len(futures) < n_workers:
+                    futures.append(executor.submit(correct, t_next))
+                    t_next += 1
+                yield futures.popleft().result()
+                current_status.reset(msg="Correcting frames", current=t+1, total=n_frames)
+        finally:
+            for fut in futures:
+                fut.cancel()
+
+    with status("Correcting frames", current=0, total=n_frames) as current_status, \
+            ThreadPoolExecutor(max_workers=n_workers) as executor:
+        out(iter_corrected(executor, current_status))
@@ -56,57 +56,124 @@ def generic_filter(img, fun, size=3, reflect=False):
     return filtered_img
 
 
-def binarize_frame_cellpose(img, mask_size=3):
-    """Coarse segmentation of phase-contrast image frame
-
-    Returns binarized image of frame
+class CellposeSegmenter:
+    """Cellpose segmentation engine.
+
+    The Cellpose model is loaded once upon first use and is then
+    used for all subsequent evaluations.
+
+    Arguments:
+        pretrained_model -- name of a model in 'cellpose_models/models.json';
+                            if None, the built-in 'cyto' model is used
+        gpu -- bool, whether to use the GPU (if available)
+        n_threads -- int, number of threads for evaluation on the CPU;
+                     if None, the default of torch is used
+        diameter -- expected cell diameter in pixels
+        flow_threshold -- flow error threshold of Cellpose
+        batch_size -- number of frames passed to Cellpose at once
     """
-    from cellpose import models
-    from cellpose.io import logger_setup
-    from skimage.morphology import binary_erosion
-    
-    flow_threshold=0.8
-    mask_threshold=0
-    pretrained_model=None
-    nucleus_bottom_percentile=0.05
-    nucleus_top_percentile=99.95
-    cyto_bottom_percentile=0.1
-    cyto_top_percentile=99.9
-    check_preprocessing=False
-    diameter=35
-
-    pretrained_model='mdamb231'
-    pretrained_model=None
-    gpu=True
-
-    if pretrained_model is None:
-        model = models.Cellpose(gpu=gpu, model_type='cyto')
-    
-    else:
+    def __init__(self, pretrained_model=None, gpu=True, n_threads=None, diameter=35, flow_threshold=0.8, batch_size=8):
+        self.pretrained_model = pretrained_model
+        self.gpu = gpu
+        self.n_threads = n_threads
+        self.diameter = diameter
+        self.flow_threshold = flow_threshold
+        self.batch_size = max(1, batch_size)
+        self._model = None
+
+    @property
+    def model(self):
+        """The Cellpose model; loaded upon first access"""
+        if self._model is None:
+            self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        from cellpose import models
+
+        if self.n_threads is not None:
+            import torch
+            torch.set_num_threads(self.n_threads)
+
+        if self.pretrained_model is None:
+            return models.Cellpose(gpu=self.gpu, model_type='cyto')
+
+        pretrained_model = self.pretrained_model
         path_to_models = os.path.join(os.path.dirname(__file__), 'cellpose_models')
         with open(os.path.join(path_to_models, 'models.json'), 'r') as f:
             dic = json.load(f)
-            
+
         if pretrained_model in dic.keys():
             path_to_model = os.path.join(path_to_models, dic[pretrained_model]['path'])
             if os.path.isfile(path_to_model):
                 pretrained_model = path_to_model
-            else: 
+            else:
                 url = dic[pretrained_model]['link']
                 print('Downloading model from Nextcloud...')
                 request.urlretrieve(url, path_to_model)
                 pretrained_model = path_to_model
 
-        model = models.CellposeModel(gpu=gpu, pretrained_model=pretrained_model)
-    
-    # images = np.stack((cytoplasm, nucleus), axis=-1)
+        return models.CellposeModel(gpu=self.gpu, pretrained_model=pretrained_model)
+
+    def segment(self, imgs):
+        """Segment a sequence of images.
+
+        Returns a list of label images.
+        The images are evaluated in batches of `batch_size`.
+        """
+        imgs = list(imgs)
+        masks = []
+        for i in range(0, len(imgs), self.batch_size):
+            batch = imgs[i:i+self.batch_size]
+            batch_masks = self.model.eval(batch,
+                                          diameter=self.diameter,
+                                          channels=[0,0],
+                                          flow_threshold=self.flow_threshold,
+                                         )[0]
+            masks.extend(batch_masks)
+        return masks
+
+    def binarize(self, imgs):
+        """Segment a sequence of images and return list of binarized images"""
+        return [binarize_mask(mask) for mask in self.segment(imgs)]
+
+
+def binarize_mask(mask):
+    """Binarize a label image, separating adjacent cells by erosion"""
+    return erode_labels(mask)
 
-    mask = model.eval(img, diameter=diameter, channels=[0,0], flow_threshold=flow_threshold)[0].astype('uint8')
-    
-    img_bin = np.zeros(mask.shape, dtype='bool')
-    cell_ids = np.unique(mask)
-    cell_ids = cell_ids[cell_ids!=0]
-    for cell_id in cell_ids:
-        img_bin+=binary_erosion(mask==cell_id)
 
+def erode_labels(mask):
+    """Erode each labeled region of a label image separately.
+
+    A pixel with non-zero label is retained if all of its 4-connected
+    neighbours within the image have the same label. This is equivalent
+    to an erosion of the mask of each label with a cross-shaped
+    structuring element (treating pixels outside of the image as
+    belonging to the region), but takes only one pass over the image.
+
+    Returns a boolean array with same shape as `mask`.
+    """
+    mask = np.asarray(mask)
+    img_bin = mask != 0
+    same_v = mask[1:, :] == mask[:-1, :]
+    same_h = mask[:, 1:] == mask[:, :-1]
+    img_bin[1:, :] &= same_v
+    img_bin[:-1, :] &= same_v
+    img_bin[:, 1:] &= same_h
+    img_bin[:, :-1] &= same_h
     return img_bin
+
+
+def binarize_frame_cellpose(img, mask_size=3, segmenter=None):
+    """Coarse segmentation of phase-contrast image frame
+
+    `segmenter` -- `CellposeSegmenter` instance; if None, a new
+                   segmenter (loading the Cellpose model) is created.
+                   For segmenting multiple frames, use the same segmenter.
+
+    Returns binarized image of frame
+    """
+    if segmenter is None:
+        segmenter = CellposeSegmenter()
+    return segmenter.binarize([img])[0]
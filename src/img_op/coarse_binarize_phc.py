@@ -53,13 +53,54 @@ def generic_filter(img, fun, size=3, reflect=False):
     return filtered_img
 
 
-def binarize_frame(img, mask_size=3):
+def window_var_box(img, size=3):
+    """Calculate unnormed variance of 'img' in windows around each pixel.
+
+    img -- the image to be filtered
+    size -- the size (side length) of the window; must be an odd integer
+
+    Returns a np.float64 array with same shape as 'img'.
+
+    This function yields the same result as
+    `generic_filter(img, window_std, size=size)`, but uses separable
+    box filters for the windowed sums of the values and squared values,
+    which takes constant time per pixel.
+    """
+    if size % 2 != 1:
+        raise ValueError("'size' must be an odd integer")
+    # Subtract mean for numerical stability
+    img = np.asarray(img, dtype=np.float64)
+    img = img - img.mean()
+    box = np.ones(size, dtype=np.float64)
+
+    def box_sum(x):
+        x = smg.correlate1d(x, box, axis=0, mode='mirror')
+        return smg.correlate1d(x, box, axis=1, mode='mirror')
+
+    sum1 = box_sum(img)
+    sum2 = box_sum(img**2)
+    var = sum2 - sum1**2 / size**2
+
+    # Remove rounding errors, particularly for constant windows
+    var[var <= 1e-12 * sum2] = 0
+    return var
+
+
+def binarize_frame(img, mask_size=3, fast=True):
     """Coarse segmentation of phase-contrast image frame
 
+    img -- the image to be binarized
+    mask_size -- side length of window for local variance
+    fast -- if True, calculate the local variance with box filters
+            (`window_var_box`), else with the numba-based `generic_filter`
+
     Returns binarized image of frame
     """
     # Get logarithmic standard deviation at each pixel
-    std_log = generic_filter(img, window_std, size=mask_size)
+    if fast:
+        std_log = window_var_box(img, size=mask_size)
+    else:
+        std_log = generic_filter(img, window_std, size=mask_size)
     std_log[std_log>0] = (np.log(std_log[std_log>0]) - np.log(mask_size**2 - 1)) / 2
 
     # Get width of histogram modulus
@@ -0,0 +1,103 @@
+"""Read out intensity statistics of ROIs in images.
+
+The pixels of all ROIs of a frame are indexed once, and the statistics
+of all ROIs are computed at once per image using `np.bincount` or
+sorting by ROI, instead of indexing the image for each ROI separately.
+"""
+import numpy as np
+
+STAT_SUM = 'sum'
+STAT_COUNT = 'count'
+STAT_MEAN = 'mean'
+STAT_MEDIAN = 'median'
+
+
+def roi_pixels(rois, shape):
+    """Index the pixels of ROIs.
+
+    Arguments:
+        rois -- sequence of ROIs providing the pixel coordinates
+                as `rows` and `cols`
+        shape -- shape (height, width) of the images
+
+    Returns a tuple of the flat indices of the pixels of all ROIs,
+    ordered by ROI, and the corresponding ROI indices.
+    Pixels belonging to several ROIs occur once for each ROI.
+    """
+    n = len(rois)
+    if not n:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    sizes = np.array([roi.rows.size for roi in rois], dtype=np.intp)
+    rows = np.concatenate([roi.rows for roi in rois])
+    cols = np.concatenate([roi.cols for roi in rois])
+    pixels = np.ravel_multi_index((rows, cols), shape)
+    groups = np.repeat(np.arange(n, dtype=np.intp), sizes)
+    return pixels, groups
+
+
+def grouped_stats(values, groups, n, stat=STAT_SUM):
+    """Calculate a statistic of values for each group.
+
+    Arguments:
+        values -- 1-dim array of values
+        groups -- 1-dim int array of the same size as `values`
+                  with the group index (0 to `n - 1`) of each value
+        n -- number of groups
+        stat -- the statistic: `STAT_SUM`, `STAT_COUNT`, `STAT_MEAN`,
+                `STAT_MEDIAN` or a number between 0 and 100 for a percentile
+
+    Returns a float array of length `n`. Empty groups yield 0 for
+    sums and counts, else NaN. Percentiles are interpolated linearly,
+    as by `np.percentile`.
+    """
+    if stat == STAT_COUNT:
+        return np.bincount(groups, minlength=n).astype(float)
+    elif stat in (STAT_SUM, STAT_MEAN):
+        sums = np.bincount(groups, weights=values, minlength=n)
+        if stat == STAT_SUM:
+            return sums
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / np.bincount(groups, minlength=n)
+
+    q = 50 if stat == STAT_MEDIAN else float(stat)
+    if not 0 <= q <= 100:
+        raise ValueError(f"Invalid statistic: {stat}")
+    order = np.lexsort((values, groups))
+    values = values[order].astype(float)
+    counts = np.bincount(groups, minlength=n)
+    starts = np.cumsum(counts) - counts
+    pos = q / 100 * np.maximum(counts - 1, 0)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, np.maximum(counts - 1, 0))
+    res = np.full(n, np.nan)
+    has_px = counts > 0
+    v_lo = values[(starts + lo)[has_px]]
+    v_hi = values[(starts + hi)[has_px]]
+    res[has_px] = v_lo + (v_hi - v_lo) * (pos - lo)[has_px]
+    return res
+
+
+def read_rois(images, rois, stat=STAT_SUM, out=None):
+    """Read out a statistic of ROIs in images.
+
+    Arguments:
+        images -- sequence of images of same shape, e.g. the channels of a frame
+        rois -- sequence of ROIs providing `rows` and `cols`
+        stat -- the statistic, see `grouped_stats`
+        out -- optional array of shape (len(rois), len(images))
+               for writing the result
+
+    The ROI pixels are indexed once for all images.
+    Overlapping ROIs are allowed.
+
+    Returns a float array of shape (len(rois), len(images)).
+    """
+    n = len(rois)
+    if out is None:
+        out = np.empty((n, len(images)), dtype=float)
+    if not len(images):
+        return out
+    pixels, groups = roi_pixels(rois, images[0].shape)
+    for j, img in enumerate(images):
+        out[:, j] = grouped_stats(img.ravel()[pixels], groups, n, stat)
+    return out
@@ -21,6 +21,8 @@ CMD_READ_SESSION_FROM_DISK = 'cmd_read_session_from_disk'
 CMD_SAVE_SESSION_TO_DISK = 'cmd_save_session_to_disk'
 CMD_CONFIG_SESSION = 'cmd_config_session'
 CMD_SET_MICROSCOPE = 'cmd_set_microscope'
+CMD_RETRACK = 'cmd_retrack'
+CMD_SET_STACK_CACHE = 'cmd_set_stack_cache'
 CMD_SET_SESSION = 'cmd_set_session'
 CMD_DISCARD_SESSION = 'cmd_discard_session'
 CMD_NEW_STACK = 'cmd_new_stack'
@@ -5,6 +5,7 @@ from . import const
 from .events import Event
 from .model import SessionModel
 from .status import Status
+from ..stack import StackCache
 
 def threaded(fn):
     """Decorator function for running in a new thread
@@ -34,6 +35,7 @@ class SessionController:
         self.view = None
         self.sessions = {}
         self.current_session = None
+        self.stack_cache = None
         self.status = Status()
         self.cmd_map = {
             const.CMD_INIT_SESSION: self.initialize_session,
@@ -44,6 +46,8 @@ class SessionController:
             const.CMD_CONFIG_SESSION: self.config_session,
             const.CMD_READ_SESSION_FROM_DISK: self.read_session_from_disk,
             const.CMD_SET_MICROSCOPE: self.set_microscope,
+            const.CMD_RETRACK: self.retrack,
+            const.CMD_SET_STACK_CACHE: self.set_stack_cache,
             const.CMD_TOOL_BINARIZE: self.binarize_phasecontrast_stack,
             const.CMD_TOOL_CELLPOSE_BINARIZE: self.cellpose_binary_segmentation,
             const.CMD_TOOL_BGCORR: self.background_correction,
@@ -105,7 +109,9 @@ class SessionController:
         """
         with self.lock:
             sess_id = Event.now()
-            self.sessions[sess_id] = SessionModel()
+            session = SessionModel()
+            session.stack_cache = self.stack_cache
+            self.sessions[sess_id] = session
             Event.fire(self.view.queue, const.RESP_NEW_SESSION_ID, sess_id)
 
     def discard_session(self, session_id):
@@ -190,10 +196,28 @@ class SessionController:
         with self.lock, self.status("Reading session from disk …"):
             sess_id = Event.now()
             session = SessionModel()
+            session.stack_cache = self.stack_cache
             self.sessions[sess_id] = session
             chan_info = session.from_stackio(fn, status=self.status)
             Event.fire(self.control_queue, self.config_session, sess_id, chan_info, do_track=False)
 
+    def set_stack_cache(self, enabled):
+        """Enable or disable the persistent stack cache.
+
+        If enabled, decoded stacks are stored in a `StackCache`
+        and re-opened from there when opened again.
+        The setting applies to stacks opened afterwards.
+
+        This method must be called from the control thread.
+        """
+        with self.lock:
+            if not enabled:
+                self.stack_cache = None
+            elif self.stack_cache is None:
+                self.stack_cache = StackCache()
+            for session in self.sessions.values():
+                session.stack_cache = self.stack_cache
+
     @threaded
     def set_microscope(self, session, name=None, resolution=None, status=None):
         """Update microscope info.
@@ -213,6 +237,25 @@ class SessionController:
             status = self.status
         session.set_microscope(name=name, resolution=resolution, status=status)
         Event.fire(self.view.queue, const.CMD_UPDATE_TRACES)
+
+    @threaded
+    def retrack(self, session, status=None, **params):
+        """Repeat tracking with changed tracking parameters.
+
+        The cells of the given session `session` are tracked again
+        in a new thread. `params` are directly passed to
+        `SessionModel.retrack`.
+        `status` is a `Status` instance for displaying the progress.
+        If None, it is set to the status object of the
+        `SessionController` instance.
+        After tracking, an event is fired to update the traces in the viewer.
+
+        This method is thread-safe.
+        """
+        if status is None:
+            status = self.status
+        session.retrack(status=status, **params)
+        Event.fire(self.view.queue, const.CMD_UPDATE_TRACES)
         
     @threaded
     def save_session_to_disk(self, session, save_dir, status=None):
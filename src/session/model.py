@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 import threading
 
@@ -12,7 +13,9 @@ import skimage.morphology as skmorph
 from . import const
 from .events import Event
 from .status import DummyStatus
+from .traces import TraceStore
 
+from ..img_op import readout
 from ..io import StackdataIO
 from ..roi import ContourRoi
 from ..stack import Stack
@@ -45,11 +48,12 @@ class SessionModel:
         the channel selection buttons.
 
     self.traces
-        dict of dict
-        The keys of the outer dict are the trace names (as str),
-        each trace corresponding to one tracked cell.
-        The inner dict holds information of the trace:
-        'roi'       list with frame index as index and corresponding
+        TraceStore
+        Array-backed storage of the traces, see `TraceStore` for
+        vectorized access. It is a mapping of the trace names (as str),
+        each trace corresponding to one tracked cell, to views
+        of the traces, which hold information of the trace:
+        'roi'       array with frame index as index and corresponding
                     ROI name as value. The ContourRoi instance can
                     be retrieved from `self.rois` using the frame
                     index and the ROI name.
@@ -57,7 +61,7 @@ class SessionModel:
         'highlight' boolean; if True, cell/trace is highlighted in
                     stackviewer and in plot. Only meaningful if
                     the 'select' option is True.
-        'val'       dict of values read for the cell. The dict keys are
+        'val'       mapping of values read for the cell. The keys are
                     the name of the quantity, the dict values are the
                     corresponding values of the quantity. For most quantities
                     (currently for all), the values are 1-dim numpy arrays
@@ -65,6 +69,10 @@ class SessionModel:
                     corresponding frame. Cell size is automatically present
                     with the key 'Area'. Integrated fluorescence intensities
                     are read for each fluorescence channel.
+                    The values are scaled by the 'factor' in `self.trace_info`.
+        'raw'       mapping of the unscaled values read for the cell, with
+                    the same keys as 'val'. Changing a factor only requires
+                    to rescale these values, see `self.apply_trace_factors`.
         'plot'      dict of plot objects (e.g. Line2D instance). The dict keys
                     are the plotted quantities (as in 'val'), the values
                     are the plot objects. Useful for plot manipulations
@@ -103,7 +111,7 @@ class SessionModel:
     """
     def __init__(self):
         self.lock = threading.RLock()
-        self.traces = {}
+        self.traces = TraceStore()
         self.trace_info = {}
         self.rois = []
 
@@ -112,6 +120,10 @@ class SessionModel:
         self.display_stack = None
         self.stacks = {}
         self.stack = None
+        self.stack_cache = None
+        self.n_workers = None
+        self.cellpose_segmenter = None
+        self.tracker = None
 
         self.show_contour = True
         self.show_untrackable = False
@@ -139,19 +151,22 @@ class SessionModel:
             if k != const.TYPE_AREA:
                 del self.trace_info[k]
 
-    def open_stack(self, fn, status=None):
+    def open_stack(self, fn, status=None, channels=None):
         """Open a stack and save it in SessionModel.stacks.
 
         Arguments:
             fn -- str, filename of the stack
             status -- Status instance for progress display
+            channels -- indices of the channels to be loaded; default is all channels
 
         Returns the stack_id (key to the SessionModel.stacks dictionary).
         """
         if status is None:
             status = DummyStatus()
-        stack_props = {}
-        if fn.endswith('h5'):
+        stack_props = {'lazy': True, 'cache': self.stack_cache, 'n_workers': self.n_workers}
+        if channels is not None:
+            stack_props['channels'] = channels
+        elif fn.endswith('h5'):
             stack_props['channels'] = 0
         stack_id = Event.now()
         stack = Stack(fn, status=status, **stack_props)
@@ -217,7 +232,7 @@ class SessionModel:
             except KeyError:
                 return None
 
-    def config(self, chan_info, render_factory, status=None, do_track=True):
+    def config(self, chan_info, render_factory=None, status=None, do_track=True, streaming=False):
         """Configure the session for display.
 
         'chan_info' is a list holding dictionaries with these fields, defining the channels to be displayed:
@@ -227,9 +242,12 @@ class SessionModel:
             i_channel -- int, index of stack to be used
             label -- str, optional user-defined description
             type -- str, stack type (phasecontrast, fluorescence, binary)
-        'render_factory' is a factory function for the display_stack rendering function
+        'render_factory' is a factory function for the display_stack rendering function.
+            If None, no rendering function is set, e.g. for headless processing.
         'status' is a Status instance for updating the status display.
         'do_track' is a flag whether to perform tracking or not.
+        'streaming' is a flag whether to track the cells while reading
+            the segmented stack, see `track_stack`.
 
         Returns True in case of success, else False.
         """
@@ -242,6 +260,8 @@ class SessionModel:
             status = DummyStatus()
 
         with self.lock, status("Preparing new session"):
+            chan_info = self._select_used_channels(chan_info, status=status)
+
             # Check image sizes
             stack_ids_used = set() #TODO: close stacks that are not used
             height_general = None
@@ -294,7 +314,7 @@ class SessionModel:
                         if pad_y or pad_x:
                             with status("Cropping segmented stack"):
                                 stack.crop(right=pad_x, bottom=pad_y)
-                        self.track_stack(stack, channel=ci['i_channel'], status=status)
+                        self.track_stack(stack, channel=ci['i_channel'], status=status, streaming=streaming)
                         close_stacks.add(stack)
                     meta.add_channel(name='segmented_stack',
                                      label=ci['label'],
@@ -348,11 +368,43 @@ class SessionModel:
             if self.rois:
                 for fr, rois in enumerate(self.rois):
                     self.display_stack.set_rois(list(rois.values()), frame=fr)
-            self.display_stack.add_channel(fun=render_factory(self.stack, self.render_segmentation), scales=True)
+            if render_factory is not None:
+                self.display_stack.add_channel(fun=render_factory(self.stack, self.render_segmentation), scales=True)
 
             # Read traces
             self.read_traces()
 
+    def _select_used_channels(self, chan_info, status=None):
+        """Reload stacks with only the channels used in `chan_info`.
+
+        Returns a copy of `chan_info` whose 'i_channel' fields are
+        adjusted to the reloaded stacks.
+        """
+        used_channels = {}
+        for ci in chan_info:
+            stack = self.get_stack(ci['stack_id'])
+            if stack is None:
+                continue
+            used_channels.setdefault(ci['stack_id'], set()).add(stack.channel_indices[ci['i_channel']])
+
+        channel_map = {}
+        for stack_id, channels in used_channels.items():
+            stack = self.get_stack(stack_id)
+            channels = tuple(sorted(channels))
+            channel_map[stack_id] = {stack.channel_indices.index(ch): i for i, ch in enumerate(channels)}
+            if channels == stack.channel_indices:
+                continue
+            stack.select_channels(channels, status=status)
+            self.stacks[stack_id]['n_channels'] = stack.n_channels
+
+        new_chan_info = []
+        for ci in chan_info:
+            ci = dict(ci)
+            if ci['stack_id'] in channel_map:
+                ci['i_channel'] = channel_map[ci['stack_id']][ci['i_channel']]
+            new_chan_info.append(ci)
+        return new_chan_info
+
     def render_segmentation(self, meta, frame, scale=None, rois=None, binary=False):
         """Dynamically draw segmentation image from ROIs
 
@@ -365,7 +417,7 @@ class SessionModel:
             rois -- iterable of ROIs to show; if None, show all ROIs in frame
             binary -- if True, returned array is boolean, else uint8
         """
-        img = np.zeros((meta.height, meta.width), dtype=(np.bool if binary else np.uint8))
+        img = np.zeros((meta.height, meta.width), dtype=(bool if binary else np.uint8))
         if rois is None:
             if self.rois is None:
                 print("SessionModel.render_segmentation: trying to read non-existent ROIs") #DEBUG
@@ -384,18 +436,32 @@ class SessionModel:
         return (roi for roi in self.rois[frame].values()
                 if roi.color not in (const.ROI_COLOR_SELECTED, const.ROI_COLOR_HIGHLIGHT))
 
-    def track_stack(self, s, channel=0, status=None):
-        """Perform tracking of a given stack"""
+    def track_stack(self, s, channel=0, status=None, streaming=False):
+        """Perform tracking of a given stack
+
+        If `streaming` is True, the cells are tracked while the frames
+        are read, and ROIs are only created for the tracked cells.
+        The region data of the other cells is not kept, so that
+        `retrack` must read the stack again.
+        """
         if status is None:
             status = DummyStatus()
         with self.lock, status("Tracking cells"):
-            tracker = Tracker(segmented_stack=s, segmented_chan=channel, status=status)
+            tracker = Tracker(segmented_stack=s, segmented_chan=channel, status=status,
+                              n_workers=self.n_workers)
             if s.stacktype == 'hdf5':
                 tracker.preprocessing = self.segmentation_preprocessing
-            tracker.get_traces()
+            tracker.get_traces(streaming=streaming)
+            self.tracker = tracker
+            if streaming:
+                frame_props = [{} for _ in range(tracker.n_frames)]
+                for trace, regions in zip(tracker.traces, tracker.traces_regions):
+                    for props, l, p in zip(frame_props, trace, regions):
+                        props[l] = p
+            else:
+                frame_props = (tracker.get_regions(fr) for fr in range(tracker.n_frames))
             self.rois = []
-            self.traces = {}
-            for fr, props in tracker.props.items():
+            for fr, props in enumerate(frame_props):
                 self.rois.append({l: ContourRoi(regionprop=p,
                                                 label=l,
                                                 color=const.ROI_COLOR_UNTRACKABLE,
@@ -403,21 +469,47 @@ class SessionModel:
                                                 name_visible=False,
                                                 frame=fr,
                                                ) for l, p in props.items()})
-            for i, trace in enumerate(tracker.traces):
-                name = str(i + 1)
-                is_selected = tracker.traces_selection[i]
-                self.traces[name] = {'roi': trace,
-                                     'select': is_selected,
-                                     'highlight': False,
-                                     'val': {},
-                                     'plot': {},
-                                    }
-                for fr, j in enumerate(trace):
-                    roi = self.rois[fr][j]
-                    roi.name = name
-                    roi.color = const.ROI_COLOR_SELECTED if is_selected else const.ROI_COLOR_DESELECTED
-                    roi.visible = bool(roi.name) and self.show_contour
-                    roi.name_visible = self.show_name
+            self._traces_from_tracker()
+
+    def retrack(self, status=None, **params):
+        """Repeat tracking with changed tracking parameters.
+
+        `params` -- new values of `min_size`, `max_size` and/or `ignore_size`
+
+        Reuses the region data of the last call of `track_stack`
+        and reads the trace values again.
+        """
+        if self.tracker is None:
+            raise ValueError("No stack has been tracked.")
+        if status is None:
+            status = DummyStatus()
+        with self.lock, status("Tracking cells"):
+            self.tracker.status = status
+            self.tracker.retrack(**params)
+            for rois in self.rois:
+                for roi in rois.values():
+                    roi.name = None
+                    roi.color = const.ROI_COLOR_UNTRACKABLE
+                    roi.visible = self.show_untrackable
+                    roi.name_visible = False
+            self._traces_from_tracker()
+            self.read_traces(status=status)
+
+    def _traces_from_tracker(self):
+        """Build `traces` from the traces of `tracker` and mark their ROIs"""
+        tracker = self.tracker
+        self.traces = TraceStore(names=[str(i + 1) for i in range(len(tracker.traces))],
+                                 rois=tracker.traces,
+                                 select=tracker.traces_selection,
+                                 n_frames=tracker.n_frames,
+                                )
+        for name, trace, is_selected in zip(self.traces.names, tracker.traces, tracker.traces_selection):
+            for fr, j in enumerate(trace):
+                roi = self.rois[fr][j]
+                roi.name = name
+                roi.color = const.ROI_COLOR_SELECTED if is_selected else const.ROI_COLOR_DESELECTED
+                roi.visible = bool(roi.name) and self.show_contour
+                roi.name_visible = self.show_name
 
     def segmentation_preprocessing(self, img):
         """Preprocessing function for smoothening segmentation
@@ -431,23 +523,27 @@ class SessionModel:
         from Ilastik for tracking, using the .label.Tracker.preprocessing attribute.
         """
         img = img >= .5
-        img = skmorph.closing(img, selem=skmorph.disk(5))
-        img = skmorph.erosion(img, selem=skmorph.disk(1))
-        img = skmorph.dilation(img, selem=skmorph.disk(3))
+        img = skmorph.closing(img, footprint=skmorph.disk(5))
+        img = skmorph.erosion(img, footprint=skmorph.disk(1))
+        img = skmorph.dilation(img, footprint=skmorph.disk(3))
         #img = skmorph.area_closing(img, area_threshold=100)
         #img = skmorph.area_opening(img, area_threshold=100)
         img = skmorph.remove_small_holes(img, area_threshold=150)
         img = skmorph.remove_small_objects(img, min_size=150)
         return img
 
-    def read_traces(self, status=None):
-        """Read out cell traces"""
+    def read_traces(self, status=None, n_workers=None):
+        """Read out cell traces
+
+        The frames are read out in `n_workers` threads
+        (default: `self.n_workers`, or the number of CPUs if None).
+        """
         if not self.traces:
             return
         if status is None:
             status = DummyStatus()
 
-        with self.lock, status("Reading traces"):
+        with self.lock, status("Reading traces") as current_status:
             n_frames = self.stack.n_frames
 
             # Get fluorescence channels
@@ -456,37 +552,55 @@ class SessionModel:
                 if info['type'] == ty.TYPE_FLUORESCENCE:
                     fl_chans.append({'name': name,
                                      'i_channel': info['channel'],
-                                     'img': None,
                                     })
             fl_chans.sort(key=lambda ch: self.trace_info[ch['name']]['order'])
 
-            # Get microscope resolution (=area conversion factor)
-            area_factor = self.trace_info[const.TYPE_AREA]['factor']
-
-            # Read traces
-            for tr in self.traces.values():
-                tr['val'].clear()
-
-                # Area
-                val_area = np.empty(n_frames, dtype=np.float)
-                for fr, i in enumerate(tr['roi']):
-                    val_area[fr] = self.rois[fr][i].area
-                if area_factor is not None:
-                    val_area *= area_factor
-                tr['val'][const.TYPE_AREA] = val_area
-
-                # Fluorescence
-                for ch in fl_chans:
-                    tr['val'][ch['name']] = np.empty(n_frames, dtype=np.float)
-
+            # Area
+            store = self.traces
+            store.clear_values()
+            val_area = np.empty((store.n_traces, n_frames), dtype=float)
             for fr in range(n_frames):
-                images = {}
-                for ch in fl_chans:
-                    ch['img'] = self.stack.get_image(frame=fr, channel=ch['i_channel'])
-                for tr in self.traces.values():
-                    roi = self.rois[fr][tr['roi'][fr]]
-                    for ch in fl_chans:
-                        tr['val'][ch['name']][fr] = np.sum(ch['img'][roi.rows, roi.cols])
+                rois = self.rois[fr]
+                val_area[:, fr] = [rois[l].area for l in store.rois[:, fr]]
+            store.set_raw(const.TYPE_AREA, val_area)
+
+            # Fluorescence, read for all traces at once per frame
+            if fl_chans:
+                self._read_fluorescence(fl_chans, current_status, n_workers)
+
+            self.apply_trace_factors()
+
+    def _read_fluorescence(self, fl_chans, current_status, n_workers=None):
+        """Read raw fluorescence values of the traces for the channels `fl_chans`"""
+        store = self.traces
+        n_frames = self.stack.n_frames
+        fl_values = np.empty((store.n_traces, n_frames, len(fl_chans)), dtype=float)
+
+        def read_frame(fr):
+            rois = [self.rois[fr][l] for l in store.rois[:, fr]]
+            images = [self.stack.get_image(frame=fr, channel=ch['i_channel']) for ch in fl_chans]
+            readout.read_rois(images, rois, out=fl_values[:, fr, :])
+
+        if n_workers is None:
+            n_workers = self.n_workers or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(read_frame, fr) for fr in range(n_frames)]
+            try:
+                for i, fut in enumerate(as_completed(futures), start=1):
+                    fut.result()
+                    current_status.reset(msg="Reading traces", current=i, total=n_frames)
+            except BaseException:
+                for fut in futures:
+                    fut.cancel()
+                raise
+
+        for j, ch in enumerate(fl_chans):
+            store.set_raw(ch['name'], fl_values[:, :, j])
+
+    def apply_trace_factors(self):
+        """Update the trace values from the raw values and the factors in `trace_info`"""
+        with self.lock:
+            self.traces.apply_factors({name: info['factor'] for name, info in self.trace_info.items()})
 
     def add_trace_info(self, name, label=None, channel=None, unit="a.u.",
             factor=None, type_=None, order=None, plot=False, quantity=None):
@@ -511,26 +625,21 @@ class SessionModel:
         """
         with self.lock:
             rois = self.rois[fr]
-            traces_pos = {}
-            for name, tr in self.traces.items():
-                roi = rois[tr['roi'][fr]]
-                traces_pos[name] = (roi.y_min, roi.x_min)
-        return sorted(traces_pos.keys(), key=lambda name: traces_pos[name])
+            store = self.traces
+            pos = [(rois[l].y_min, rois[l].x_min) for l in store.rois[:, fr]]
+            order = sorted(range(store.n_traces), key=pos.__getitem__)
+        return [store.names[i] for i in order]
 
     def traces_as_dataframes(self):
         """Return a dict of DataFrames of the traces"""
         t = self.to_hours(np.array(range(self.stack.n_frames)))
-        time_vec = pd.DataFrame(t, columns=("Time [h]",))
+        store = self.traces
+        names = store.selected()
         df_dict = {}
-        for name, tr in self.traces.items():
-            if not tr['select']:
-                continue
-            for qty, data in tr['val'].items():
-                try:
-                    df_dict[qty][name] = data
-                except KeyError:
-                    df_dict[qty] = time_vec.copy()
-                    df_dict[qty][name] = data
+        for q, qty in enumerate(store.quantities):
+            df = pd.DataFrame(store.values[q, store.select].T, columns=names)
+            df.insert(0, "Time [h]", t)
+            df_dict[qty] = df
         return df_dict
 
     def plot_traces(self, fig, is_interactive=False, frame_indicator_list=None, status=None):
@@ -558,10 +667,15 @@ class SessionModel:
             for qty, ax in zip(plot_list, axes):
                 ax.set_xmargin(.003)
                 ax.yaxis.set_major_formatter(StrMethodFormatter('{x:.4g}'))
-                for name, tr in self.traces.items():
-                    if not tr['select']:
+                # Plot all selected traces of a highlight state at once,
+                # highlighted traces on top
+                store = self.traces
+                values = store.values[store.quantity_index(qty)]
+                for is_highlight in (False, True):
+                    idx = np.flatnonzero(store.select & (store.highlight == is_highlight))
+                    if not idx.size:
                         continue
-                    if tr['highlight']:
+                    if is_highlight:
                         lw = const.PLOT_WIDTH_HIGHLIGHT
                         alpha = const.PLOT_ALPHA_HIGHLIGHT
                         color = const.PLOT_COLOR_HIGHLIGHT
@@ -569,11 +683,13 @@ class SessionModel:
                         lw = const.PLOT_WIDTH
                         alpha = const.PLOT_ALPHA
                         color = const.PLOT_COLOR
-                    l = ax.plot(t_vec, tr['val'][qty],
-                            color=color, alpha=alpha, lw=lw, label=name,
+                    lines = ax.plot(t_vec, values[idx].T,
+                            color=color, alpha=alpha, lw=lw,
                             picker=is_interactive, pickradius=3)
-                    if is_interactive:
-                        tr['plot'][qty] = l
+                    for i, l in zip(idx, lines):
+                        l.set_label(store.names[i])
+                        if is_interactive:
+                            store.plots[i][qty] = [l]
 
                 xlbl = "Time [h]"
                 ax.set_ylabel("{quantity} [{unit}]".format(**self.trace_info[qty]))
@@ -581,10 +697,10 @@ class SessionModel:
 
                 if is_interactive:
                     if frame_indicator_list is not None:
-                        frame_indicator_list.append(ax.axvline(np.NaN, lw=1.5, color='r'))
+                        frame_indicator_list.append(ax.axvline(np.nan, lw=1.5, color='r'))
                 else:
                     ax.xaxis.set_tick_params(labelbottom=True)
-                if ax.is_last_row():
+                if ax.get_subplotspec().is_last_row():
                     ax.set_xlabel(xlbl)
 
     def to_hours(self, x):
@@ -593,7 +709,7 @@ class SessionModel:
             with self.lock:
                 return x / self.frames_per_hour
         except Exception:
-            return np.NaN
+            return np.nan
 
     @property
     def mic_name(self):
@@ -611,7 +727,9 @@ class SessionModel:
         Arguments:
             name -- str, human-readable microscope/objective name
             resolution -- float, image resolution in [µm/px]
-            status -- Status, passed on to `SessionModel.read_traces`
+            status -- Status for displaying progress
+
+        The trace values are rescaled without reading them again.
         """
         if not resolution:
             name = None
@@ -630,7 +748,10 @@ class SessionModel:
             else:
                 self.trace_info[const.TYPE_AREA]['unit'] = "px²"
                 self.trace_info[const.TYPE_AREA]['factor'] = None
-            self.read_traces(status=status)
+        if status is None:
+            status = DummyStatus()
+        with self.lock, status("Updating traces"):
+            self.apply_trace_factors()
 
     def save_session(self, save_dir, status=None):
         """Save the session.
@@ -658,6 +779,13 @@ class SessionModel:
                 df.to_csv(os.path.join(save_dir, f"{name}.csv"), header=False, index=False, float_format='%.5f')
 
             # Export ROIs to JSON file
+            sd = self.to_stackio()
+            sd.dump(save_dir, "session.zip")
+        print(f"Data have been written to '{save_dir}'") #DEBUG
+
+    def to_stackio(self):
+        """Get a StackdataIO instance holding the session content"""
+        with self.lock:
             sd = StackdataIO(traces=self.traces, rois=self.rois)
             sd.n_frames = self.stack.n_frames
             sd.microscope_name = self.mic_name
@@ -668,13 +796,13 @@ class SessionModel:
                 else:
                     path = self.stack.stack(ch.name).path
                 i_channel = ch.channel
+                if i_channel is not None and not ch.isVirtual:
+                    i_channel = self.stack.stack(ch.name).channel_indices[i_channel]
                 type_ = ch.type
                 name = ch.name
                 label = ch.label
                 sd.add_channel(path, type_, i_channel, name, label)
-
-            sd.dump(save_dir, "session.zip")
-        print(f"Data have been written to '{save_dir}'") #DEBUG
+        return sd
 
     def from_stackio(self, fn, status=None):
         """Load session content from StackdataIO instance.
@@ -693,35 +821,34 @@ class SessionModel:
         sd.load(fin=fn)
         self.set_microscope(name=sd.microscope_name, resolution=sd.microscope_resolution)
         self.rois = sd.rois
-        for trace in sd.traces:
-            name = trace['name']
-            self.traces[name] = {
-                    'name': name,
-                    'roi': trace['rois'],
-                    'select': trace['select'],
-                    'highlight': False,
-                    'val': {},
-                    'plot': {},
-                    }
-
-        # Load stacks
-        chan_info = []
+        self.traces = TraceStore(names=[trace['name'] for trace in sd.traces],
+                                 rois=[trace['rois'] for trace in sd.traces],
+                                 select=[trace['select'] for trace in sd.traces],
+                                 n_frames=sd.n_frames,
+                                )
+
+        # Load stacks with only the used channels
+        stack_channels = {}
+        for ch in sd.channels:
+            if ch['file_directory'] is not None and ch['file_name'] is not None:
+                path = os.path.join(ch['file_directory'], ch['file_name'])
+                stack_channels.setdefault(path, set()).add(ch['i_channel'])
         stack_paths = {}
+        for path, channels in stack_channels.items():
+            channels = sorted(channels)
+            stack_paths[path] = self.open_stack(path, status=status, channels=channels), channels
+
+        chan_info = []
         for ch in sd.channels:
             x = {}
             if ch['file_directory'] is None or ch['file_name'] is None:
-                path = None
                 x['stack_id'] = None
+                x['i_channel'] = ch['i_channel']
             else:
                 path = os.path.join(ch['file_directory'], ch['file_name'])
-                try:
-                    x['stack_id'] = stack_paths[path]
-                except KeyError:
-                    stack_id = self.open_stack(path, status=status)
-                    stack_paths[path] = stack_id
-                    x['stack_id'] = stack_id
+                x['stack_id'], channels = stack_paths[path]
+                x['i_channel'] = channels.index(ch['i_channel'])
             x['name'] = ch['name']
-            x['i_channel'] = ch['i_channel']
             x['label'] = ch['label']
             x['type'] = ch['type']
             chan_info.append(x)
@@ -751,7 +878,14 @@ class SessionModel:
                              )
         return result
 
-    def cellpose_segmentation(self, *, outfile=None, status=None, return_result=False):
+    def cellpose_segmentation(self, *, outfile=None, status=None, return_result=False, **segmenter_args):
+        """Binarize the phase-contrast channel using Cellpose.
+
+        The Cellpose model is loaded once and kept for further calls.
+        `segmenter_args` are passed to `CellposeSegmenter`; if they differ
+        from the current segmenter, a new segmenter is created.
+        """
+        from ..img_op.cellpose_segmentation import CellposeSegmenter
         from ..tools.binarize import segment_with_cellpose
 
         # Get index of first phase-contrast channel
@@ -766,19 +900,30 @@ class SessionModel:
         spec = self.stack.channels[i_channel]
         stack = self.stack.stack(spec.name)
         phc_channel = spec.channel
+        if self.cellpose_segmenter is None or \
+                any(getattr(self.cellpose_segmenter, k) != v for k, v in segmenter_args.items()):
+            self.cellpose_segmenter = CellposeSegmenter(**segmenter_args)
         result = segment_with_cellpose(stack=stack,
                               i_channel=phc_channel,
                               outfile=outfile,
                               status=status,
                               return_result=return_result,
+                              segmenter=self.cellpose_segmenter,
                              )
         return result
 
 
 
 
-    def background_correction(self, outfile, status=None):
-        from ..tools.bgcorr import perform_background_correction
+    def background_correction(self, outfile, status=None, mem_lim=None):
+        """Perform background correction of the first fluorescence channel.
+
+        The frames are read from the stack and the corrected frames
+        are written to the TIFF file `outfile` one by one.
+        `mem_lim` limits the memory used for the calculation,
+        see `background_schwarzfischer_streaming`.
+        """
+        from ..tools.bgcorr import ChannelFrames, perform_background_correction
 
         i_chan_fl = None
         i_chan_bin = None
@@ -794,22 +939,15 @@ class SessionModel:
         if i_chan_fl is None:
             print("SessionModel.background_correction: no fluorescence channel found.") #DEBUG
             return
-        c_fl0 = self.stack.get_image(channel=i_chan_fl, frame=0)
-        chan_fl = np.empty((self.stack.n_frames, self.stack.height, self.stack.width), dtype=c_fl0.dtype)
-        chan_fl[0, ...] = c_fl0
-        for t in range(1, self.stack.n_frames):
-            chan_fl[t, ...] = self.stack.get_image(channel=i_chan_fl, frame=t)
+        chan_fl = ChannelFrames(self.stack, i_chan_fl)
 
         # Get segmentation channel
         if i_chan_bin is None:
             outfile_bin = f"{os.path.splitext(outfile)[0]}_segmented.npz"
             chan_bin = self.binarize_phc_stack(outfile=outfile_bin, status=status, return_result=True)
         else:
-            c_bin0 = self.stack.get_image(channel=i_chan_bin, frame=0)
-            chan_bin = np.empty((self.stack.n_frames, self.stack.height, self.stack.width), dtype=c_bin0.dtype)
-            chan_bin[0, ...] = c_bin0
-            for t in range(1, self.stack.n_frames):
-                chan_bin[t, ...] = self.stack.get_image(channel=i_chan_bin, frame=t)
+            chan_bin = ChannelFrames(self.stack, i_chan_bin)
 
-        perform_background_correction(chan_fl=chan_fl, chan_bin=chan_bin, outfile=outfile, status=status)
+        perform_background_correction(chan_fl=chan_fl, chan_bin=chan_bin, outfile=outfile, status=status,
+                                      mem_lim=mem_lim)
 
@@ -0,0 +1,221 @@
+"""Columnar storage of cell traces."""
+from collections.abc import Mapping, MutableMapping
+import numbers
+
+import numpy as np
+
+
+class TraceStore(Mapping):
+    """Array-backed storage of cell traces.
+
+    Arguments:
+        names -- sequence of str, the trace names
+        rois -- sequence with one sequence of ROI labels per trace,
+                holding the label of the ROI of the trace in each frame
+        select -- sequence of bool, selection of each trace; default: all selected
+        n_frames -- int, number of frames; only needed if `names` is empty
+
+    The trace data are held in these arrays:
+        rois        (n_traces x n_frames) array of ROI labels; an int
+                    array for integer labels (as assigned by tracking),
+                    else an object array holding the labels unchanged
+        select      (n_traces) bool array, whether the trace is selected
+        highlight   (n_traces) bool array, whether the trace is highlighted
+        raw         (n_quantities x n_traces x n_frames) float array
+                    of unscaled values
+        values      (n_quantities x n_traces x n_frames) float array
+                    of values scaled by the factors of the quantities
+    The quantities are listed in `quantities`.
+
+    For compatibility with the former dict of dicts, a `TraceStore`
+    is a mapping of the trace names to `TraceView` objects, which
+    provide the fields 'name', 'roi', 'select', 'highlight', 'val',
+    'raw' and 'plot' as views of the arrays.
+    """
+    def __init__(self, names=(), rois=None, select=None, n_frames=None):
+        self.names = [str(name) for name in names]
+        self._index = {name: i for i, name in enumerate(self.names)}
+        if len(self._index) != len(self.names):
+            raise ValueError("Trace names are not unique.")
+        n_traces = len(self.names)
+        if rois is None or not n_traces:
+            self.rois = np.empty((n_traces, n_frames or 0), dtype=np.intp)
+        else:
+            self.rois = self._label_array(rois)
+            if self.rois.ndim != 2 or self.rois.shape[0] != n_traces:
+                raise ValueError("Each trace must have one ROI per frame.")
+        if select is None:
+            self.select = np.ones(n_traces, dtype=bool)
+        else:
+            self.select = np.array(select, dtype=bool)
+        self.highlight = np.zeros(n_traces, dtype=bool)
+        self.plots = [{} for _ in range(n_traces)]
+        self.quantities = []
+        self.raw = np.empty((0, n_traces, self.n_frames), dtype=float)
+        self.values = self.raw.copy()
+
+    @staticmethod
+    def _label_array(rois):
+        """Convert the ROI labels of the traces into an array.
+
+        Labels of imported sessions may be ROI names instead of integers;
+        they are kept as they are, since they are the keys of the ROI dicts.
+        """
+        arr = np.array(rois, dtype=object)
+        if all(isinstance(label, numbers.Integral) for label in arr.flat):
+            return arr.astype(np.intp)
+        return arr
+
+    @property
+    def n_traces(self):
+        return len(self.names)
+
+    @property
+    def n_frames(self):
+        return self.rois.shape[1]
+
+    def __getitem__(self, name):
+        return TraceView(self, self._index[name])
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def index(self, name):
+        """Get the row index of trace `name`"""
+        return self._index[name]
+
+    def quantity_index(self, qty):
+        """Get the index of quantity `qty` in `raw` and `values`"""
+        return self.quantities.index(qty)
+
+    def clear_values(self):
+        """Remove all quantities"""
+        self.quantities = []
+        self.raw = np.empty((0, self.n_traces, self.n_frames), dtype=float)
+        self.values = self.raw.copy()
+
+    def set_raw(self, qty, raw, factor=None):
+        """Set the unscaled values of a quantity.
+
+        Arguments:
+            qty -- str, name of the quantity; added if not present
+            raw -- (n_traces x n_frames) array of the unscaled values
+            factor -- factor for scaling the values, or None
+        """
+        raw = np.asarray(raw, dtype=float).reshape(self.n_traces, self.n_frames)
+        try:
+            q = self.quantity_index(qty)
+        except ValueError:
+            self.quantities.append(qty)
+            self.raw = np.concatenate((self.raw, raw[np.newaxis]))
+            self.values = np.concatenate((self.values, raw[np.newaxis]))
+            q = len(self.quantities) - 1
+        else:
+            self.raw[q] = raw
+        self._scale(q, factor)
+
+    def apply_factors(self, factors):
+        """Scale the raw values.
+
+        `factors` -- dict mapping quantity names to factors;
+                     missing quantities and None are not scaled
+        """
+        for q, qty in enumerate(self.quantities):
+            self._scale(q, factors.get(qty))
+
+    def _scale(self, q, factor):
+        if factor is None:
+            self.values[q] = self.raw[q]
+        else:
+            np.multiply(self.raw[q], factor, out=self.values[q])
+
+    def selected(self):
+        """Get the names of the selected traces"""
+        return [self.names[i] for i in np.flatnonzero(self.select)]
+
+
+class TraceView(Mapping):
+    """View of one trace of a `TraceStore`, indexed like the former trace dict"""
+    __slots__ = ('_store', '_i')
+    _keys = ('name', 'roi', 'select', 'highlight', 'val', 'raw', 'plot')
+
+    def __init__(self, store, i):
+        self._store = store
+        self._i = i
+
+    def __getitem__(self, key):
+        store = self._store
+        i = self._i
+        if key == 'name':
+            return store.names[i]
+        elif key == 'roi':
+            return store.rois[i]
+        elif key == 'select':
+            return bool(store.select[i])
+        elif key == 'highlight':
+            return bool(store.highlight[i])
+        elif key == 'val':
+            return QuantityView(store, i, raw=False)
+        elif key == 'raw':
+            return QuantityView(store, i, raw=True)
+        elif key == 'plot':
+            return store.plots[i]
+        raise KeyError(key)
+
+    def __setitem__(self, key, val):
+        if key == 'select':
+            self._store.select[self._i] = val
+        elif key == 'highlight':
+            self._store.highlight[self._i] = val
+        elif key == 'roi':
+            self._store.rois[self._i] = val
+        else:
+            raise KeyError(f"Trace field '{key}' cannot be set")
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class QuantityView(MutableMapping):
+    """View of the values (or raw values) of one trace for all quantities"""
+    __slots__ = ('_store', '_i', '_raw')
+
+    def __init__(self, store, i, raw=False):
+        self._store = store
+        self._i = i
+        self._raw = raw
+
+    def _array(self):
+        return self._store.raw if self._raw else self._store.values
+
+    def __getitem__(self, qty):
+        try:
+            q = self._store.quantity_index(qty)
+        except ValueError:
+            raise KeyError(qty) from None
+        return self._array()[q, self._i]
+
+    def __setitem__(self, qty, val):
+        try:
+            q = self._store.quantity_index(qty)
+        except ValueError:
+            raise KeyError(f"Unknown quantity '{qty}'; use `TraceStore.set_raw` to add quantities") from None
+        self._array()[q, self._i] = val
+
+    def __delitem__(self, qty):
+        raise TypeError("Quantities can only be removed from the `TraceStore`")
+
+    def __iter__(self):
+        return iter(self._store.quantities)
+
+    def __len__(self):
+        return len(self._store.quantities)
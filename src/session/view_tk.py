@@ -1,6 +1,7 @@
 import os
 import queue
 import re
+import threading
 import time
 import tkinter as tk
 import tkinter.filedialog as tkfd
@@ -115,10 +116,14 @@ class SessionView_Tk(SessionView):
         self.var_show_frame_indicator = tk.BooleanVar(value=True)
         self.var_mode = tk.StringVar(value=MODE_HIGHLIGHT)
         self.var_darken_deselected = tk.BooleanVar(value=False)
+        self.darken_deselected = self.var_darken_deselected.get()
+        self.display_width = None
+        self._render_display = None
         self.var_show_roi_contours = tk.BooleanVar(value=True)
         self.var_show_roi_names = tk.BooleanVar(value=True)
         self.var_show_untrackable = tk.BooleanVar(value=False)
         self.var_microscope_res = tk.StringVar(value=MIC_RES_UNSPEC)
+        self.var_stack_cache = tk.BooleanVar(value=False)
 
         # Build menu
         menubar = tk.Menu(self.root)
@@ -143,6 +148,7 @@ class SessionView_Tk(SessionView):
         self.toolmenu.add_command(label='Cellpose segmentation', command=self.cellpose_binarize)
         self.toolmenu.add_command(label="Pickle maximum bounding box", command=self._pickle_max_bbox)
         self.toolmenu.add_command(label="Background correction…", command=self._background_correction)
+        self.toolmenu.add_command(label="Retrack…", command=self._retrack)
         settmenu = tk.Menu(menubar)
 
         menubar.add_cascade(label="Settings", menu=settmenu)
@@ -151,6 +157,8 @@ class SessionView_Tk(SessionView):
         settmenu.add_checkbutton(label="Display cell labels", variable=self.var_show_roi_names)
         settmenu.add_checkbutton(label="Display untracked cells", variable=self.var_show_untrackable)
         settmenu.add_checkbutton(label="Darken deselected cells", variable=self.var_darken_deselected)
+        settmenu.add_checkbutton(label="Cache decoded stacks on disk", variable=self.var_stack_cache,
+                                 command=self._set_stack_cache)
 
         self.micresmenu = tk.Menu(settmenu)
         settmenu.add_cascade(label="Microscope resolution", menu=self.micresmenu)
@@ -203,6 +211,9 @@ class SessionView_Tk(SessionView):
         self.stackframe = tk.Frame(self.paned)
         self.paned.add(self.stackframe, sticky='NESW', width=650)
         self.stackviewer = StackViewer(parent=self.stackframe, root=self.root, show_buttons='contrast')
+        self.stackviewer.set_frame_cache(key_fcn=self._display_settings_key,
+                                         render_fcn=self._render_cached_frame)
+        self.stackviewer.i_frame_var.trace_add('write', self._frame_changed)
 
         ## Figure frame
         self.figframe = tk.Frame(self.paned)
@@ -216,7 +227,7 @@ class SessionView_Tk(SessionView):
 
         # Callbacks
         self.var_show_frame_indicator.trace_add('write', self._update_frame_indicator)
-        self.var_darken_deselected.trace_add('write', lambda *_: self.display_stack._listeners.notify('image'))
+        self.var_darken_deselected.trace_add('write', self._update_darken_deselected)
         self.var_show_roi_contours.trace_add('write', self._update_show_roi_contours)
         self.var_show_roi_names.trace_add('write', self._update_show_roi_names)
         self.var_show_untrackable.trace_add('write', self._update_show_untrackable)
@@ -425,8 +436,38 @@ class SessionView_Tk(SessionView):
         elif not os.path.isdir(self.save_dir):
             raise NotADirectoryError("Not a directory: '{}'".format(self.save_dir))
 
+    def _frame_changed(self, *_):
+        """Callback for frame changes of the stackviewer"""
+        if self.session is not None:
+            self.root.after_idle(self._update_frame_indicator)
+
+    def _update_darken_deselected(self, *_):
+        """Callback for darkening deselected cells"""
+        self.darken_deselected = self.var_darken_deselected.get()
+        self.display_stack._listeners.notify('image')
+
+    def _display_settings_key(self):
+        """Get the display settings for rendering and caching frames.
+
+        Returns a tuple of the indices of the displayed channels,
+        the darkening flag and the display width.
+        """
+        if self.display_width is None:
+            self.display_width = self.stackframe.winfo_width()
+        channels = tuple(i for i, ch in sorted(self.channel_selection.items()) if ch['val'])
+        if not channels:
+            channels = (0,)
+        return channels, self.darken_deselected, self.display_width
+
+    def _render_cached_frame(self, channel, frame, settings):
+        """Render a display frame for the frame cache of the stackviewer"""
+        if self._render_display is None:
+            return self.display_stack.get_frame_uint8(channel=channel, frame=frame)
+        return self._render_display(self.display_stack, frame, settings=settings)
+
     def _stacksize_changed(self, evt):
         """Update stackviewer after stack size change"""
+        self.display_width = evt.width
         self.stackviewer._change_stack_position(force=True)
 
     def _key_highlight_cell(self, evt):
@@ -583,33 +624,31 @@ class SessionView_Tk(SessionView):
         stack -- metastack of session instance
         render_segmentation -- function for rendering binary segmentation image
         """
-        def render_display(meta, frame, scale=None):
+        def render_display(meta, frame, scale=None, settings=None):
             """Dynamically create display image.
 
             This method is to be called by `MetaStack.get_image`
-            within the GUI thread.
+            within the GUI thread, or by the frame cache of the
+            stackviewer, possibly from its prefetching thread.
 
             Arguments:
                 meta -- the calling `MetaStack` instance; ignored
                 frame -- the index of the selected frame
                 scale -- scaling information; ignored
+                settings -- display settings as returned by
+                        `_display_settings_key`; if None,
+                        the current settings are used
             """
             nonlocal self, stack, render_segmentation
             #TODO histogram-based contrast adjustment
-            # Find channel to display
-            channels = []
-            for i in sorted(self.channel_selection.keys()):
-                if self.channel_selection[i]['val']:
-                    channels.append(i)
-            if not channels:
-                channels.append(0)
-
-            # Update frame indicator
-            self.root.after_idle(self._update_frame_indicator)
+            if settings is None:
+                if threading.current_thread() is threading.main_thread():
+                    # Get image scale
+                    self.root.update_idletasks()
+                    self.display_width = self.stackframe.winfo_width()
+                settings = self._display_settings_key()
+            channels, darken_deselected, display_width = settings
 
-            # Get image scale
-            self.root.update_idletasks()
-            display_width = self.stackframe.winfo_width()
             if self.display_stack.width != display_width:
                 scale = display_width / stack.width
             else:
@@ -621,7 +660,7 @@ class SessionView_Tk(SessionView):
             for i in channels:
                 img = stack.get_image(channel=i, frame=frame, scale=scale)
                 if stack.spec(i).type != ty.TYPE_SEGMENTATION:
-                    if self.var_darken_deselected.get():
+                    if darken_deselected:
                         # Darken deselected and untracked cells
                         if seg_img is None:
                             seg_img = render_segmentation(stack, frame,
@@ -642,6 +681,7 @@ class SessionView_Tk(SessionView):
             img = ((img - img_min) * (255 / (img_max - img_min))).astype(np.uint8)
 
             return img
+        self._render_display = render_display
         return render_display
 
     def update_traces(self):
@@ -704,7 +744,7 @@ class SessionView_Tk(SessionView):
                     fr = self.stackviewer.i_frame
                 t = self.session.to_hours(fr)
         else:
-            t = np.NaN
+            t = np.nan
         for indicator in self.frame_indicators:
             indicator.set_xdata([t, t])
         if draw:
@@ -954,6 +994,10 @@ class SessionView_Tk(SessionView):
                     command=lambda v=value: self._change_microscope_resolution(v),
                     )
 
+    def _set_stack_cache(self):
+        """Callback for enabling/disabling the persistent stack cache"""
+        Event.fire(self.control_queue, const.CMD_SET_STACK_CACHE, self.var_stack_cache.get())
+
     def _change_microscope_resolution(self, mic_res):
         """Callback for changing microscope resolution
 
@@ -1095,6 +1139,35 @@ class SessionView_Tk(SessionView):
                   )
                 
 
+    def _retrack(self):
+        """Track the cells again with changed cell size limits"""
+        if self.session is None or self.session.tracker is None:
+            print("No tracked stack")
+            return
+        tracker = self.session.tracker
+
+        # Get cell size limits
+        min_size = tksd.askinteger(
+                "Retrack",
+                "Enter minimum cell size [px]:",
+                minvalue=0, parent=self.root, initialvalue=tracker.min_size)
+        if min_size is None:
+            return
+        max_size = tksd.askinteger(
+                "Retrack",
+                "Enter maximum cell size [px]:",
+                minvalue=0, parent=self.root, initialvalue=tracker.max_size)
+        if max_size is None:
+            return
+
+        # Start tracking
+        Event.fire(self.control_queue,
+                   const.CMD_RETRACK,
+                   self.session,
+                   min_size=min_size,
+                   max_size=max_size,
+                  )
+
     def _pickle_max_bbox(self):
         """Export bounding box of maximum extension of each selected cell"""
         if self.session is None or not self.session.traces:
@@ -1,2 +1,3 @@
 from .stack import Stack
+from ._cache import StackCache
 from .metastack import MetaStack
@@ -0,0 +1,215 @@
+"""Persistent on-disk cache of decoded stacks."""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from .. import util
+
+CACHE_DIRNAME = 'stack_cache'
+DEFAULT_MAX_BYTES = 20 * 2**30
+STALE_PART_AGE = 24 * 3600
+
+
+class StackCache:
+    """Cache decoded stacks as uncompressed, memory-mappable arrays.
+
+    Arguments:
+        directory -- str, cache directory; defaults to a directory
+                     on the disk returned by `util.get_disk_temp_dir`
+        max_bytes -- int, maximum total size of the cache in bytes.
+                     The least recently used entries are evicted first.
+
+    Each entry consists of a `.npy` file with the image data
+    of shape (n_channels, n_frames, height, width) and a `.json` file
+    with the stack properties. Entries are keyed by the absolute path,
+    size and modification time of the stack file and by the load arguments,
+    so that modified files are decoded again.
+
+    Entries are written to files with suffix `.part`, which are left
+    behind if the process is killed while writing. Such files are
+    removed upon eviction once they are older than `STALE_PART_AGE` seconds.
+    """
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        if directory is None:
+            directory = os.path.join(util.get_disk_temp_dir(), CACHE_DIRNAME)
+        os.makedirs(directory, mode=0o775, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.RLock()
+        self._writing = set()
+
+    @staticmethod
+    def make_key(path, **load_args):
+        """Get the cache key for a stack file.
+
+        `path` -- str, path of the stack file
+        `load_args` -- further arguments influencing the decoded stack,
+                       e.g. selected channels; must be JSON-serializable
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        key = json.dumps([path, st.st_size, st.st_mtime_ns, load_args], sort_keys=True)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.npy', base + '.json'
+
+    def get(self, key):
+        """Look up a cache entry.
+
+        Returns a tuple of the image array and the properties dict,
+        or None if `key` is not cached.
+        The array is a copy-on-write memory map of the cache file.
+        """
+        path_npy, path_json = self._paths(key)
+        with self.lock:
+            try:
+                with open(path_json, 'r') as f:
+                    props = json.load(f)
+                arr = np.load(path_npy, mmap_mode='c', allow_pickle=False)
+            except (OSError, ValueError):
+                return None
+            # Update access time for LRU eviction
+            for p in (path_npy, path_json):
+                try:
+                    os.utime(p)
+                except OSError:
+                    pass
+        return arr, props
+
+    def create(self, key, shape, dtype):
+        """Create a new cache entry.
+
+        Returns a `StackCacheEntry` whose `img` attribute is a writable
+        memory map. The entry is only visible in the cache after
+        `StackCacheEntry.commit` is called.
+        """
+        fd, path = tempfile.mkstemp(suffix='.npy.part', dir=self.directory)
+        os.close(fd)
+        try:
+            img = open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+        except Exception:
+            os.remove(path)
+            raise
+        with self.lock:
+            self._writing.add(path)
+        return StackCacheEntry(self, key, path, img)
+
+    def _commit(self, entry, props):
+        """Move a completely written entry into the cache.
+
+        All other references to `entry.img` must have been released,
+        since a memory-mapped file cannot be moved on Windows.
+        """
+        path_npy, path_json = self._paths(entry.key)
+        with self.lock:
+            try:
+                entry.img.flush()
+                entry.img = None
+                os.replace(entry.tmp_path, path_npy)
+                with open(path_json + '.part', 'w') as f:
+                    json.dump(props, f)
+                os.replace(path_json + '.part', path_json)
+            except Exception:
+                entry.discard()
+                for p in (path_npy, path_json + '.part'):
+                    try:
+                        os.remove(p)
+                    except OSError:
+                        pass
+                raise
+            self._writing.discard(entry.tmp_path)
+            self.evict(keep=entry.key)
+
+    def _discard(self, entry):
+        """Delete the file of an incompletely written entry"""
+        with self.lock:
+            entry.img = None
+            try:
+                os.remove(entry.tmp_path)
+            except OSError:
+                pass
+            self._writing.discard(entry.tmp_path)
+
+    def _remove_stale_parts(self, max_age=STALE_PART_AGE):
+        """Remove `.part` files not written by this cache and older than `max_age` seconds"""
+        now = time.time()
+        with self.lock:
+            for de in os.scandir(self.directory):
+                if not de.name.endswith('.part') or de.path in self._writing:
+                    continue
+                try:
+                    if now - de.stat().st_mtime >= max_age:
+                        os.remove(de.path)
+                except OSError:
+                    pass
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache is small enough.
+
+        The entry with key `keep` is not removed.
+        Stale `.part` files are removed, too.
+        """
+        with self.lock:
+            self._remove_stale_parts()
+            entries = []
+            total = 0
+            for de in os.scandir(self.directory):
+                if not de.name.endswith('.npy'):
+                    continue
+                try:
+                    st = de.stat()
+                except OSError:
+                    continue
+                total += st.st_size
+                entries.append((max(st.st_atime, st.st_mtime), st.st_size, de.name[:-len('.npy')]))
+            entries.sort()
+            for _, size, key in entries:
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                for p in self._paths(key):
+                    try:
+                        os.remove(p)
+                    except OSError:
+                        pass
+                total -= size
+
+    def clear(self):
+        """Remove all entries from the cache"""
+        with self.lock:
+            for de in os.scandir(self.directory):
+                if de.name.endswith(('.npy', '.json')):
+                    try:
+                        os.remove(de.path)
+                    except OSError:
+                        pass
+            self._remove_stale_parts(max_age=0)
+
+
+class StackCacheEntry:
+    """Cache entry being written; created by `StackCache.create`"""
+    def __init__(self, cache, key, tmp_path, img):
+        self.cache = cache
+        self.key = key
+        self.tmp_path = tmp_path
+        self.img = img
+
+    def commit(self, props):
+        """Add the entry to the cache.
+
+        `props` -- JSON-serializable dict of the stack properties
+        """
+        self.cache._commit(self, props)
+
+    def discard(self):
+        """Delete the incompletely written entry"""
+        self.cache._discard(self)
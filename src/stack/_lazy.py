@@ -0,0 +1,244 @@
+"""Read-only array backends for stacks whose images are read on demand."""
+import tempfile
+import threading
+
+import numpy as np
+
+
+class LazyImageArray:
+    """Read-only, array-like view of a stack that reads images on demand.
+
+    The array has the shape (n_channels, n_frames, height, width),
+    like `Stack.img`. Indexing with integer channel and frame indices
+    returns the image (or a part of it) without reading other images.
+    Indexing multiple channels or frames returns a new numpy array.
+
+    Subclasses must implement `_read_image`.
+    """
+    ndim = 4
+
+    def __init__(self, shape, dtype):
+        self.shape = tuple(int(x) for x in shape)
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+
+    def _read_image(self, channel, frame):
+        """Return the (height x width) image at the given position"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the resources held by the backend"""
+        pass
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _normalize_key(self, key):
+        """Expand `key` to a tuple of one index per dimension"""
+        if not isinstance(key, tuple):
+            key = (key,)
+        if any(k is Ellipsis for k in key):
+            i = next(i for i, k in enumerate(key) if k is Ellipsis)
+            n_fill = self.ndim - len(key) + 1
+            key = (*key[:i], *(slice(None),) * n_fill, *key[i+1:])
+        if len(key) > self.ndim:
+            raise IndexError(f"Too many indices for array with {self.ndim} dimensions")
+        return (*key, *(slice(None),) * (self.ndim - len(key)))
+
+    def __getitem__(self, key):
+        key = self._normalize_key(key)
+        idx_img = key[2:]
+        channels = np.arange(self.shape[0])[key[0]]
+        frames = np.arange(self.shape[1])[key[1]]
+        if np.ndim(channels) == 0 and np.ndim(frames) == 0:
+            return self._read_image(int(channels), int(frames))[idx_img]
+        out = np.array([[self._read_image(int(ch), int(fr))[idx_img]
+                         for fr in np.atleast_1d(frames)]
+                        for ch in np.atleast_1d(channels)],
+                       dtype=self.dtype)
+        if np.ndim(frames) == 0:
+            out = out[:, 0, ...]
+        if np.ndim(channels) == 0:
+            out = out[0, ...]
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self[...]
+        if dtype is not None:
+            arr = arr.astype(dtype, copy=False)
+        return arr
+
+
+class LazyTiffArray(LazyImageArray):
+    """Lazy backend for TIFF stacks.
+
+    Arguments:
+        tiff -- open `tifffile.TiffFile`; it is closed by `LazyTiffArray.close`
+        page_idx -- (n_channels x n_frames) array of page indices
+        height, width -- image dimensions
+        dtype -- data type of the images
+
+    Uncompressed pages are memory-mapped directly from the TIFF file.
+    Other pages are decoded upon first access into a sparse temporary
+    file, from which they are served on subsequent accesses.
+    """
+    def __init__(self, tiff, page_idx, height, width, dtype):
+        page_idx = np.asarray(page_idx)
+        super().__init__((*page_idx.shape, height, width), dtype)
+        self._tiff = tiff
+        self._tiff.pages.cache = True
+        self._page_idx = page_idx
+        self._file_map = None
+        self._tmpfile = None
+        self._decoded = None
+        self._is_decoded = None
+
+    def _read_image(self, channel, frame):
+        with self._lock:
+            page = self._tiff.pages[int(self._page_idx[channel, frame])]
+            if page.is_memmappable:
+                return self._map_page(page)
+
+            if self._decoded is None:
+                self._tmpfile = tempfile.TemporaryFile()
+                self._decoded = np.memmap(filename=self._tmpfile,
+                                          dtype=self.dtype,
+                                          shape=self.shape)
+                self._is_decoded = np.zeros(self.shape[:2], dtype=bool)
+            img = self._decoded[channel, frame, :, :]
+            if not self._is_decoded[channel, frame]:
+                page.asarray(out=img)
+                self._is_decoded[channel, frame] = True
+            return img
+
+    def _map_page(self, page):
+        """Return a read-only view of the page data in the TIFF file"""
+        if self._file_map is None:
+            self._file_map = np.memmap(self._tiff.filehandle.path, dtype=np.uint8, mode='r')
+        offset = page.dataoffsets[0]
+        n_bytes = self.shape[2] * self.shape[3] * self.dtype.itemsize
+        return self._file_map[offset:offset+n_bytes].view(self.dtype).reshape(self.shape[2:])
+
+    def close(self):
+        with self._lock:
+            self._file_map = None
+            self._decoded = None
+            self._is_decoded = None
+            try:
+                self._tmpfile.close()
+            except Exception:
+                pass
+            self._tmpfile = None
+            self._tiff.close()
+
+
+def hdf5_frames_per_slab(data5, idx, max_bytes=2**26):
+    """Number of frames to read at once from an HDF5 dataset.
+
+    For datasets chunked along time, this is the chunk length along time,
+    so that each chunk is decompressed only once. Else, the number of
+    frames fitting into `max_bytes`.
+    """
+    if 't' not in idx:
+        return 1
+    if data5.chunks is not None:
+        return data5.chunks[idx['t']]
+    frame_bytes = data5.size // data5.shape[idx['t']] * data5.dtype.itemsize
+    return max(1, min(data5.shape[idx['t']], max_bytes // max(frame_bytes, 1)))
+
+
+def read_hdf5_frames(data5, idx, channels, start, stop, buf=None):
+    """Read a hyperslab of frames from an HDF5 dataset.
+
+    Arguments:
+        data5 -- the `h5py.Dataset`
+        idx -- dict mapping the dimensions 't', 'c', 'y', 'x' to axes of `data5`;
+               't' and 'c' may be missing
+        channels -- sequence of the channel indices to be read
+        start, stop -- range of the frames to be read
+        buf -- optional C-contiguous array used for reading, is reused
+               if it has the required shape
+
+    Returns a tuple of the images as (n_channels x n_frames x height x width)
+    array (possibly a view of the buffer) and the buffer.
+    """
+    dims = sorted(idx, key=idx.get)
+    sel = [slice(None)] * data5.ndim
+    if 't' in idx:
+        sel[idx['t']] = slice(start, stop)
+    if 'c' in idx:
+        ch_min = min(channels)
+        sel[idx['c']] = slice(ch_min, max(channels) + 1)
+    shape = tuple(len(range(*s.indices(n))) for s, n in zip(sel, data5.shape))
+    if buf is None or buf.shape != shape:
+        buf = np.empty(shape, dtype=data5.dtype)
+    data5.read_direct(buf, source_sel=tuple(sel))
+
+    arr = buf
+    for dim in 'ct':
+        if dim not in idx:
+            arr = arr[..., np.newaxis]
+            dims.append(dim)
+    arr = arr.transpose([dims.index(dim) for dim in 'ctyx'])
+    if 'c' in idx:
+        arr = arr[[ch - ch_min for ch in channels]]
+    return arr, buf
+
+
+class LazyHdf5Array(LazyImageArray):
+    """Lazy backend for HDF5 stacks.
+
+    Arguments:
+        h5 -- open `h5py.File`; it is closed by `LazyHdf5Array.close`
+        data5 -- the `h5py.Dataset` holding the stack
+        idx -- dict mapping dimensions to axes of `data5`, see `read_hdf5_frames`
+        channels -- sequence of the channel indices to be read
+        n_frames, height, width -- stack dimensions
+
+    The frames are read in slabs aligned to the chunks of the dataset
+    upon first access into a sparse temporary file, from which they
+    are served on subsequent accesses.
+    """
+    def __init__(self, h5, data5, idx, channels, n_frames, height, width):
+        super().__init__((len(channels), n_frames, height, width), data5.dtype)
+        self._h5 = h5
+        self._data5 = data5
+        self._idx = idx
+        self._channels = tuple(channels)
+        self._slab_size = hdf5_frames_per_slab(data5, idx)
+        self._tmpfile = tempfile.TemporaryFile()
+        self._decoded = np.memmap(filename=self._tmpfile, dtype=self.dtype, shape=self.shape)
+        self._is_decoded = np.zeros(n_frames, dtype=bool)
+        self._buf = None
+
+    def _read_image(self, channel, frame):
+        with self._lock:
+            if not self._is_decoded[frame]:
+                start = frame - frame % self._slab_size
+                stop = min(start + self._slab_size, self.shape[1])
+                slab, self._buf = read_hdf5_frames(self._data5, self._idx,
+                                                   self._channels, start, stop, self._buf)
+                self._decoded[:, start:stop, :, :] = slab
+                self._is_decoded[start:stop] = True
+            return self._decoded[channel, frame, :, :]
+
+    def close(self):
+        with self._lock:
+            self._decoded = None
+            self._is_decoded = None
+            self._buf = None
+            try:
+                self._tmpfile.close()
+            except Exception:
+                pass
+            self._tmpfile = None
+            self._data5 = None
+            self._h5.close()
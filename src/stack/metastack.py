@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+import tempfile
 import threading
 
 import numpy as np
@@ -48,14 +49,19 @@ class MetaStack:
         self._width = None
         self._height = None
         self._mode = None
+        self._pyramids = {}
+        self._stack_listeners = {}
+        self._outdated_stacks = set()
         self.__rois = {}
 
         self.close = self.clear
 
     def clear(self):
         with self.image_lock:
-            for s in self.stacks.keys():
+            for name, s in self._stacks.items():
+                s.delete_listener(self._stack_listeners.pop(name, None))
                 s.close()
+            self._clear_pyramids()
             self._stacks = {}
             self._channels = []
             self._n_frames = None
@@ -133,7 +139,12 @@ class MetaStack:
                     raise TypeError(f"Stack types '{self_dtype}'  and '{new_dtype}' not castable")
 
             # Secondly, register the stack
+            if name in self._stacks:
+                self._stacks[name].delete_listener(self._stack_listeners.pop(name, None))
+                self._clear_pyramids()
             self._stacks[name] = new_stack
+            self._stack_listeners[name] = new_stack.add_listener(
+                    lambda: self._outdated_stacks.add(name), kind='image')
 
     def add_channel(self, name=None, channel=None, fun=None, label=None, type_=None, scales=None):
         with self.image_lock:
@@ -151,6 +162,7 @@ class MetaStack:
             else:
                 raise ValueError("Stack name and channel or function required.")
             self._channels.append(spec)
+            self._delete_pyramid(len(self._channels) - 1)
         self._listeners.notify('image')
 
 
@@ -162,6 +174,7 @@ class MetaStack:
         element of the tuple is a channel index.
         """
         with self.image_lock:
+            self._clear_pyramids()
             self._channels = []
             for o in order:
                 if isinstance(o, ChannelSpec):
@@ -177,11 +190,26 @@ class MetaStack:
         return stack
 
     def get_image(self, *, channel, frame, scale=None):
-        """Get a numpy array of a stack position."""
+        """Get a numpy array of a stack position.
+
+        For non-virtual channels and a scalar `scale` smaller than 1,
+        the image is resized from the nearest level of an image pyramid,
+        see `MetaStack.get_pyramid_image`.
+        """
         with self.image_lock:
             spec = self._channels[channel]
             if spec.isVirtual:
                 img = spec.fun(self, frame=frame, scale=scale)
+            elif scale is not None and np.size(scale) == 1 and scale < 1:
+                level = int(np.floor(np.log2(1 / scale)))
+                img = self.get_pyramid_image(channel=channel, frame=frame, level=level)
+                return sktrans.resize(img,
+                                      self.scaled_shape(self._height, self._width, scale),
+                                      order=1,
+                                      mode='edge',
+                                      preserve_range=True,
+                                      anti_aliasing=False,
+                                     )
             else:
                 name = spec.name
                 ch = spec.channel
@@ -190,6 +218,86 @@ class MetaStack:
                 img = self.scale_img(img, scale)
             return img
 
+    def get_pyramid_image(self, *, channel, frame, level):
+        """Get a downsampled image of a non-virtual channel.
+
+        `channel` -- index of a non-virtual channel
+        `frame` -- index of the frame
+        `level` -- int, pyramid level; at level `n`, the image is
+                   downsampled by a factor of `2**n` by averaging
+                   2x2 blocks of level `n-1`. Level 0 is the original image.
+                   Levels exceeding the highest level are clipped.
+
+        The pyramid levels are created upon first request
+        and stored as float32 arrays in temporary files.
+        """
+        with self.image_lock:
+            self._drop_outdated_pyramids()
+            spec = self._channels[channel]
+            if level <= 0:
+                return self._stacks[spec.name].get_image(channel=spec.channel, frame=frame)
+            try:
+                pyramid = self._pyramids[channel]
+            except KeyError:
+                pyramid = self._pyramids[channel] = []
+            height = self._height
+            width = self._width
+            for lvl in range(1, level + 1):
+                height //= 2
+                width //= 2
+                if not height or not width:
+                    level = lvl - 1
+                    break
+                if len(pyramid) < lvl:
+                    tmpfile = tempfile.TemporaryFile()
+                    pyramid.append({'tmpfile': tmpfile,
+                                    'img': np.memmap(filename=tmpfile,
+                                                     dtype=np.float32,
+                                                     shape=(self._n_frames, height, width)),
+                                    'done': np.zeros(self._n_frames, dtype=bool),
+                                   })
+            if level <= 0:
+                return self.get_pyramid_image(channel=channel, frame=frame, level=0)
+            lvl = pyramid[level - 1]
+            if not lvl['done'][frame]:
+                img = self.get_pyramid_image(channel=channel, frame=frame, level=level - 1)
+                h, w = lvl['img'].shape[1:]
+                img = img[:2*h, :2*w].reshape((h, 2, w, 2))
+                lvl['img'][frame] = img.mean(axis=(1, 3), dtype=np.float32)
+                lvl['done'][frame] = True
+            return lvl['img'][frame]
+
+    def _delete_pyramid(self, channel):
+        """Delete the image pyramid of a channel"""
+        with self.image_lock:
+            for lvl in self._pyramids.pop(channel, ()):
+                lvl['img'] = None
+                lvl['tmpfile'].close()
+
+    def _clear_pyramids(self):
+        """Delete all image pyramids"""
+        with self.image_lock:
+            for channel in list(self._pyramids.keys()):
+                self._delete_pyramid(channel)
+            self._outdated_stacks.clear()
+
+    def _drop_outdated_pyramids(self):
+        """Delete the image pyramids of channels whose stack has changed.
+
+        The stacks are marked as outdated by a listener, which does not
+        acquire `image_lock` to avoid deadlocks with the stack's lock.
+        """
+        while self._outdated_stacks:
+            name = self._outdated_stacks.pop()
+            for i, spec in enumerate(self._channels):
+                if not spec.isVirtual and spec.name == name:
+                    self._delete_pyramid(i)
+
+    @staticmethod
+    def scaled_shape(height, width, scale):
+        """Get the image shape after scaling with a scalar `scale`"""
+        return tuple(np.maximum(1, np.round(np.array((height, width)) * scale)).astype(int))
+
     @staticmethod
     def scale_img(img, scale, anti_aliasing=True, anti_aliasing_sigma=None):
         """Scales an image.
@@ -206,7 +314,6 @@ class MetaStack:
         if scale.size == 1:
             return sktrans.rescale(img,
                                    scale,
-                                   multichannel=False,
                                    mode='constant',
                                    preserve_range=True,
                                    anti_aliasing=True,
@@ -227,9 +334,9 @@ class MetaStack:
         return self.get_image(channel=channel, frame=frame, scale=scale).copy()
 
 
-    def get_frame_tk(self, *, channel, frame, convert_fcn=None):
+    def get_frame_uint8(self, *, channel, frame, convert_fcn=None):
         """
-        Get a frame of the stack as :py:class:`tkinter.PhotoImage`.
+        Get a frame of the stack as ``uint8`` array.
 
         :param channel: The channel of the requested stack position
         :type channel: int
@@ -245,7 +352,7 @@ class MetaStack:
         a (n_rows, n_columns)-shaped numpy array of ``uint8`` type.
 
         :return: the image at the requested stack position
-        :rtype: :py:class:`tkinter.PhotoImage`
+        :rtype: (n_rows, n_columns)-shaped :py:class:`numpy.ndarray` of ``uint8``
         """
         #TODO
         with self.image_lock:
@@ -258,7 +365,7 @@ class MetaStack:
                 a8 = np.zeros(a0.shape, dtype=np.uint8)
                 a8[a0] = 255
             elif self._mode.startswith('uint'):
-                a8 = a0 >> ((a0.itemsize - 1) * 8)
+                a8 = (a0 >> ((a0.itemsize - 1) * 8)).astype(np.uint8)
             elif self._mode.startswith('float'):
                 #TODO: normalize to global maximum
                 a0_min = a0.min()
@@ -270,7 +377,19 @@ class MetaStack:
                 a8 = (256 / (a0_max - a0_min) * (a0 - a0_min)).astype(np.uint8)
             else:
                 raise ValueError(f"Illegal image mode: {self._mode}")
-            return piltk.PhotoImage(pilimg.fromarray(a8, mode='L'))
+            return a8
+
+    def get_frame_tk(self, *, channel, frame, convert_fcn=None):
+        """
+        Get a frame of the stack as :py:class:`tkinter.PhotoImage`.
+
+        See :py:meth:`get_frame_uint8` for the parameters.
+
+        :return: the image at the requested stack position
+        :rtype: :py:class:`tkinter.PhotoImage`
+        """
+        a8 = self.get_frame_uint8(channel=channel, frame=frame, convert_fcn=convert_fcn)
+        return piltk.PhotoImage(pilimg.fromarray(a8, mode='L'))
 
     def add_listener(self, fun, kind=None):
         """Register a listener to stack changes."""
@@ -2,6 +2,7 @@
 import json
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import tempfile
 import threading
 
@@ -11,6 +12,8 @@ import tifffile
 import PIL.Image as pilimg
 import PIL.ImageTk as piltk
 
+from ._cache import StackCacheEntry
+from ._lazy import LazyHdf5Array, LazyTiffArray, hdf5_frames_per_slab, read_hdf5_frames
 from ._parse_ome import parse_ome
 from ..roi import RoiCollection
 from ..listener import Listeners
@@ -23,14 +26,25 @@ class Stack:
 
     :param path: (optional) path to a file holding a TIFF stack
     :type path: str
+    :param lazy: (optional) if True, read images only when accessed
+        instead of copying the whole stack upon loading;
+        currently only supported for TIFF and HDF5 stacks
+    :type lazy: bool
+    :param n_workers: (optional) number of threads for decoding
+        compressed TIFF pages; defaults to the number of CPUs
+    :type n_workers: int
+    :param cache: (optional) persistent cache for decoded TIFF and HDF5 stacks
+    :type cache: `StackCache`
     """
 
-    def __init__(self, path=None, arr=None, width=None, height=None, n_frames=None, n_channels=None, dtype=None, status=None, channels=None):
+    def __init__(self, path=None, arr=None, width=None, height=None, n_frames=None, n_channels=None, dtype=None, status=None, channels=None, lazy=False, n_workers=None, cache=None):
         """Initialize a stack."""
         self.image_lock = threading.RLock()
         self.info_lock = threading.RLock()
         self.roi_lock = threading.RLock()
         self._listeners = Listeners(kinds={"roi", "image"})
+        self._cache_entry = None
+        self._closed = False
         self._clear_state()
         if status is None:
             status = DummyStatus()
@@ -38,7 +52,7 @@ class Stack:
         # Initialize stack
         if path is not None:
             # Load from file (TIFF or numpy array)
-            self.load(path, status=status, channels=channels)
+            self.load(path, status=status, channels=channels, lazy=lazy, n_workers=n_workers, cache=cache)
         elif arr is not None:
             # Use array
             self._path = None
@@ -74,6 +88,7 @@ class Stack:
             self._path = None
             self.img = None
             self._tmpfile = None
+            self._backend = None
             self._stacktype = None
 
             # The stack properties
@@ -84,7 +99,9 @@ class Stack:
             self._n_images = 0
             self._n_frames = 0
             self._n_channels = 0
+            self._channel_indices = None
             self._channel_labels = None
+            self._load_args = None
 
         # ROI list
         with self.roi_lock:
@@ -105,7 +122,7 @@ class Stack:
         return dt
 
 
-    def load(self, path, loader=None, status=None, channels=None, h5_key=None):
+    def load(self, path, loader=None, status=None, channels=None, h5_key=None, lazy=False, n_workers=None, cache=None):
         """Load a stack from a path.
 
         `path` -- path to a stack file
@@ -119,8 +136,19 @@ class Stack:
         `h5_key` -- str, key of the dataset in a HDF5 file.
                     Currently, only HDF5 files created by Ilastik are supported.
                     May be omitted if file contains only one dataset.
+        `lazy` -- bool, whether to read images only upon access.
+                  For uncompressed TIFF pages, the images are memory-mapped
+                  from the original file. HDF5 files are kept open and read
+                  in chunks upon access. Ignored for other loaders.
+        `n_workers` -- int, number of threads for decoding compressed
+                       TIFF pages. Defaults to the number of CPUs.
+        `cache` -- `StackCache` instance. If given, TIFF and HDF5 stacks
+                   are decoded into the cache (ignoring `lazy`) or, if
+                   already cached, memory-mapped from the cache.
         """
+        self._closed = False
         self._path = path
+        self._load_args = dict(path=path, loader=loader, h5_key=h5_key, lazy=lazy, n_workers=n_workers, cache=cache)
         if loader is None:
             ext = os.path.splitext(self._path)[-1]
             if ext.casefold().startswith('.tif'):
@@ -131,27 +159,199 @@ class Stack:
                 loader = 'hdf5'
             else:
                 loader = '' # to prevent error in string comparison
+
+        if cache is not None and loader in ('tiff', 'hdf5'):
+            if self._load_from_cache(cache, path, loader, channels, h5_key):
+                return
+            lazy = False
+            self._cache_entry = (cache, self._cache_key(cache, path, loader, channels, h5_key))
+        try:
+            self._load_from_loader(loader, status=status, channels=channels,
+                                   h5_key=h5_key, lazy=lazy, n_workers=n_workers)
+            if isinstance(self._cache_entry, StackCacheEntry):
+                with self.image_lock:
+                    # Release the memory map before the cache moves its file
+                    self.img = None
+                    self._cache_entry.commit(self._cache_props())
+                    self._load_cached(*cache.get(self._cache_entry.key))
+        except Exception:
+            if isinstance(self._cache_entry, StackCacheEntry):
+                with self.image_lock:
+                    self.img = None
+                    self._cache_entry.discard()
+                    self._clear_state()
+            raise
+        finally:
+            self._cache_entry = None
+
+    @staticmethod
+    def _cache_key(cache, path, loader, channels, h5_key):
+        """Get the key of a stack in `cache`"""
+        if isinstance(channels, (int, np.integer)):
+            channels = (channels,)
+        elif isinstance(channels, (tuple, list, np.ndarray)):
+            channels = tuple(int(ch) for ch in channels)
+        return cache.make_key(path, loader=loader, channels=repr(channels), h5_key=h5_key)
+
+    def _load_from_cache(self, cache, path, loader, channels, h5_key):
+        """Load the stack from `cache`, if present.
+
+        If the selected channels are not cached, but the stack with
+        all channels is, the channels are selected from the cached stack
+        instead of decoding the file again.
+
+        Returns True if the stack was loaded, else False.
+        """
+        cached = cache.get(self._cache_key(cache, path, loader, channels, h5_key))
+        if cached is not None:
+            self._load_cached(*cached)
+            return True
+        if channels is None:
+            return False
+        cached = cache.get(self._cache_key(cache, path, loader, None, h5_key))
+        if cached is None:
+            return False
+        self._load_cached(*cached, channels=channels)
+        return True
+
+    def _load_from_loader(self, loader, status=None, channels=None, h5_key=None, lazy=False, n_workers=None):
+        """Call the stack loader `loader`"""
         if loader == 'tiff':
-            self._load_tiff(status=status, channels=channels)
+            self._load_tiff(status=status, channels=channels, lazy=lazy, n_workers=n_workers)
         elif loader == 'npy':
             self._load_npy(status=status, channels=channels)
         elif loader == 'hdf5':
-            self._load_hdf5(status=status, channels=channels, h5_key=h5_key)
+            self._load_hdf5(status=status, channels=channels, h5_key=h5_key, lazy=lazy)
         else:
             self._clear_state()
             raise TypeError("Unknown type: {}".format(loader))
 
+    def select_channels(self, channels, status=None):
+        """Reload the stack from its file with only the given channels.
+
+        `channels` -- indices of the channels in the stack file to be loaded
+        `status` -- Status instance for displaying progress
+
+        The stack must have been loaded from a file. ROIs and image
+        information of the stack are kept.
+        """
+        with self.image_lock:
+            if self._load_args is None:
+                raise ValueError("Cannot select channels of a stack not loaded from a file")
+            load_args = self._load_args
+            with self.roi_lock:
+                rois = self.__rois
+            with self.info_lock:
+                info = self._info
+            self.close()
+            self.load(**load_args, channels=channels, status=status)
+            with self.roi_lock:
+                self.__rois = rois
+            with self.info_lock:
+                self._info = info
+        self._listeners.notify("roi")
+
+    def _alloc_img(self, dtype):
+        """Allocate `self.img` for loading a stack.
+
+        The array is created in a new cache entry, if caching is enabled,
+        or else in a temporary file.
+        """
+        shape = (self._n_channels, self._n_frames, self._height, self._width)
+        if self._cache_entry is not None:
+            cache, key = self._cache_entry
+            self._cache_entry = cache.create(key, shape, dtype)
+            self.img = self._cache_entry.img
+        else:
+            self._tmpfile = tempfile.TemporaryFile()
+            self.img = np.memmap(filename=self._tmpfile, dtype=dtype, shape=shape)
+
+    def _cache_props(self):
+        """Get the stack properties to be stored in a `StackCache`"""
+        return dict(stacktype=self._stacktype,
+                    mode=self._mode,
+                    order=self._order,
+                    width=self._width,
+                    height=self._height,
+                    n_images=self._n_images,
+                    n_frames=self._n_frames,
+                    n_channels=self._n_channels,
+                    channel_indices=self._channel_indices,
+                    channel_labels=self._channel_labels,
+                   )
+
+    def _load_cached(self, arr, props, channels=None):
+        """Use `arr` and `props` retrieved from a `StackCache`.
+
+        `channels` -- indices of the channels to be selected, if `arr`
+                      holds all channels of the stack file; see `load`
+        """
+        with self.image_lock:
+            self.img = arr
+            self._tmpfile = None
+            self._stacktype = props['stacktype']
+            self._mode = props['mode']
+            self._order = props['order']
+            self._width = props['width']
+            self._height = props['height']
+            self._n_images = props['n_images']
+            self._n_frames = props['n_frames']
+            self._n_channels = props['n_channels']
+            if props['channel_indices'] is None:
+                self._channel_indices = None
+            else:
+                self._channel_indices = tuple(props['channel_indices'])
+            self._channel_labels = props['channel_labels']
+            if channels is not None:
+                self._select_cached_channels(channels)
+        self._listeners.notify("image")
+
+    def _select_cached_channels(self, channels):
+        """Reduce a stack loaded from cache with all channels to `channels`"""
+        arr = self.img
+        all_indices = self.channel_indices
+        selected = self._normalize_channels(channels, len(all_indices))
+        self._channel_indices = tuple(all_indices[ch] for ch in selected)
+        if self._channel_labels is not None:
+            self._channel_labels = [self._channel_labels[ch] for ch in selected]
+        self._n_channels = len(selected)
+        self._n_images = self._n_channels * self._n_frames
+        ch_start = selected[0]
+        ch_step = selected[1] - ch_start if len(selected) > 1 else 1
+        if ch_step > 0 and selected == tuple(range(ch_start, selected[-1] + 1, ch_step)):
+            self.img = arr[ch_start:selected[-1]+1:ch_step]
+        else:
+            # Irregular channel selection cannot be expressed as view
+            self._alloc_img(dtype=arr.dtype)
+            for ch, orig_ch in enumerate(selected):
+                self.img[ch, ...] = arr[orig_ch, ...]
+
+    @staticmethod
+    def _normalize_channels(channels, n_channels):
+        """Convert a channel selection into a tuple of channel indices.
+
+        `channels` -- any value for indexing into a dimension of a numpy array,
+                      or None for all channels
+        `n_channels` -- number of channels in the stack file
+        """
+        all_channels = np.arange(n_channels)
+        if channels is None:
+            return tuple(all_channels.tolist())
+        if isinstance(channels, tuple):
+            # A tuple would index several dimensions
+            channels = list(channels)
+        return tuple(np.ravel(all_channels[channels]).tolist())
+
     def _load_npy(self, ext=None, channels=None, status=None):
-        if channels is not None:
-            #TODO implement channel selection
-            raise NotImplementedError("Channel selection for TIFF is not implemented yet")
         if status is None:
             status = DummyStatus()
         if ext is None:
             ext = os.path.splitext(self._path)[-1]
         with self.image_lock, status("Reading stack"):
             if ext == '.npy':
-                arr = np.load(self._path, mmap_mode='r', allow_pickle=False)
+                # Copy-on-write memmap: changes to `img` are kept in memory
+                # and never written back to the file
+                arr = np.load(self._path, mmap_mode='c', allow_pickle=False)
             elif ext == '.npz':
                 with np.load(self._path, mmap_mode='r', allow_pickle=False) as arr_file:
                     arr = next(iter(arr_file.values()))
@@ -174,35 +374,45 @@ class Stack:
                 arr = np.moveaxis(arr, 3, 0)
             else:
                 raise ValueError("Bad array shape: {}".format(arr.ndim))
+            self._channel_indices = self._normalize_channels(channels, self._n_channels)
+            self._n_channels = len(self._channel_indices)
             self._n_images = self._n_channels * self._n_frames
+            is_view = True
+            if self._n_channels != arr.shape[0]:
+                ch_start = self._channel_indices[0]
+                ch_step = self._channel_indices[1] - ch_start if self._n_channels > 1 else 1
+                if ch_step > 0 and self._channel_indices == tuple(range(ch_start, self._channel_indices[-1] + 1, ch_step)):
+                    arr = arr[ch_start:self._channel_indices[-1]+1:ch_step]
+                else:
+                    # Irregular channel selection cannot be expressed as view
+                    is_view = False
+            if ext == '.npy' and is_view:
+                # Use memory-mapped file directly instead of copying it;
+                # the axis order is adjusted by a view (`np.moveaxis`)
+                self.img = arr
+                self._listeners.notify("image")
+                return
             try:
-                self._tmpfile = tempfile.TemporaryFile()
-                self.img = np.memmap(filename=self._tmpfile,
-                                     dtype=arr.dtype,
-                                     shape=(self._n_channels,
-                                            self._n_frames,
-                                            self._height,
-                                            self._width
-                                           )
-                                    )
+                self._alloc_img(dtype=arr.dtype)
             except Exception:
                 self._clear_state()
                 raise
             else:
-                self.img[...] = arr[...]
+                for ch, orig_ch in enumerate(self._channel_indices):
+                    if is_view:
+                        orig_ch = ch
+                    self.img[ch, ...] = arr[orig_ch, ...]
             finally:
                 del arr
                 self._listeners.notify("image")
 
-    def _load_tiff(self, status=None, channels=None):
-        if channels is not None:
-            #TODO implement channel selection
-            raise NotImplementedError("Channel selection for TIFF is not implemented yet")
+    def _load_tiff(self, status=None, channels=None, lazy=False, n_workers=None):
         if status is None:
             status = DummyStatus()
-            print("Stack._load_tiff: use DummyStatus") #DEBUG
+        tiff = None
         try:
-            with self.image_lock, tifffile.TiffFile(self._path) as tiff, status("Reading image …") as current_status:
+            with self.image_lock, status("Reading image …") as current_status:
+                tiff = tifffile.TiffFile(self._path)
                 self._stacktype = 'tiff'
                 pages = tiff.pages
                 if not pages:
@@ -224,21 +434,36 @@ class Stack:
                 else:
                     # If TIFF type is not known, show as 1D stack
                     print("Unknown image type.")
+                    self._order = 'tc'
                     self._n_channels = 1
                     self._n_frames = self._n_images
 
+                # Find pages of selected channels
+                self._channel_indices = self._normalize_channels(channels, self._n_channels)
+                page_idx = np.empty((len(self._channel_indices), self._n_frames), dtype=np.intp)
+                for ch, orig_ch in enumerate(self._channel_indices):
+                    for fr in range(self._n_frames):
+                        page_idx[ch, fr] = self.convert_position(channel=orig_ch, frame=fr)
+                self._n_channels = len(self._channel_indices)
+                self._n_images = self._n_channels * self._n_frames
+
+                if lazy:
+                    # Keep TIFF file open and read pages upon access
+                    self._backend = LazyTiffArray(tiff, page_idx, height=self._height,
+                                                  width=self._width, dtype=page0.dtype)
+                    self.img = self._backend
+                    tiff = None
+                    return
+
                 # Copy stack to numpy array in temporary file
-                self._tmpfile = tempfile.TemporaryFile()
-                self.img = np.memmap(filename=self._tmpfile,
-                                     dtype=page0.dtype,
-                                     shape=(self._n_channels,
-                                            self._n_frames,
-                                            self._height,
-                                            self._width))
-                for i in range(self._n_images):
-                    current_status.reset("Reading image", current=i+1, total=self._n_images)
-                    ch, fr = self.convert_position(image=i)
-                    pages[i].asarray(out=self.img[ch, fr, :, :])
+                self._alloc_img(dtype=page0.dtype)
+                if page0.compression != 1 and n_workers != 1:
+                    self._read_tiff_pages_parallel(pages, page_idx, current_status, n_workers)
+                else:
+                    for i, pos in enumerate(np.argsort(page_idx, axis=None)):
+                        current_status.reset("Reading image", current=i+1, total=self._n_images)
+                        ch, fr = np.unravel_index(pos, page_idx.shape)
+                        pages[page_idx[ch, fr]].asarray(out=self.img[ch, fr, :, :])
 
         except Exception as e:
             self._clear_state()
@@ -246,14 +471,52 @@ class Stack:
             raise
 
         finally:
+            if tiff is not None:
+                tiff.close()
             self._listeners.notify("image")
 
-    def _load_hdf5(self, status=None, h5_key=None, channels=None):
+    def _read_tiff_pages_parallel(self, pages, page_idx, current_status, n_workers=None):
+        """Decode compressed TIFF pages concurrently into `self.img`.
+
+        `pages` -- the `TiffPages` instance of the TIFF file
+        `page_idx` -- (n_channels x n_frames) array of page indices
+        `current_status` -- status message for displaying progress
+        `n_workers` -- int, number of threads; defaults to the number of CPUs
+
+        The codecs of tifffile release the GIL, so decoding scales with
+        the number of threads. Reading from the file is serialized by a lock.
+        """
+        if n_workers is None:
+            n_workers = os.cpu_count()
+        read_lock = threading.Lock()
+        jobs = []
+        for pos in np.argsort(page_idx, axis=None):
+            ch, fr = np.unravel_index(pos, page_idx.shape)
+            jobs.append((pages[page_idx[ch, fr]], self.img[ch, fr, :, :]))
+
+        def read_page(page, out):
+            page.asarray(out=out, lock=read_lock, maxworkers=1)
+
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(read_page, page, out) for page, out in jobs]
+            try:
+                for i, fut in enumerate(as_completed(futures)):
+                    current_status.reset("Reading image", current=i+1, total=self._n_images)
+                    fut.result()
+            except BaseException:
+                for fut in futures:
+                    fut.cancel()
+                raise
+
+    def _load_hdf5(self, status=None, h5_key=None, channels=None, lazy=False):
         """Note: Currently only ilastik HDF5 is supported"""
         if status is None:
             status = DummyStatus()
+        h5 = None
         try:
-            with self.image_lock, h5py.File(self._path, 'r') as h5, status("Reading stack …") as current_status:
+            with self.image_lock, status("Reading stack …") as current_status:
+                # Chunk cache large enough for slabs of big chunks
+                h5 = h5py.File(self._path, 'r', rdcc_nbytes=2**26)
                 self._stacktype = 'hdf5'
                 if h5_key is not None:
                     key = h5_key
@@ -288,41 +551,37 @@ class Stack:
                     self._n_channels = data5.shape[idx['c']]
                 except KeyError:
                     self._n_channels = 1
-                    channels = (None,)
+                    self._channel_indices = (0,)
+                    channels = (0,)
                 else:
-                    if channels is None:
-                        channels = range(self._n_channels)
-                    elif isinstance(channels, slice):
-                        channels = range(*channels.indices(self._n_channels))
-                        self._n_channels = len(channels)
-                    elif isinstance(channels, range):
-                        self._n_channels = len(channels)
-                    else:
-                        channels = np.ravel(channels)
-                        self._n_channels = channels.size
+                    channels = self._normalize_channels(channels, self._n_channels)
+                    self._channel_indices = channels
+                    self._n_channels = len(channels)
                 self._n_images = self._n_frames * self._n_channels
 
+                if lazy:
+                    # Keep HDF5 file open and read chunks upon access
+                    self._backend = LazyHdf5Array(h5, data5, idx, channels,
+                                                  n_frames=self._n_frames,
+                                                  height=self._height,
+                                                  width=self._width)
+                    self.img = self._backend
+                    h5 = None
+                    return
+
                 # Copy stack to numpy array in temporary file
-                self._tmpfile = tempfile.TemporaryFile()
-                self.img = np.memmap(filename=self._tmpfile,
-                                     dtype=data5.dtype,
-                                     shape=(self._n_channels,
-                                            self._n_frames,
-                                            self._height,
-                                            self._width))
-                i = np.zeros(len(idx), dtype=np.object)
-                for dim in 'xy':
-                    i[idx[dim]] = slice(None)
-                for fr in range(self._n_frames):
-                    if 't' in idx:
-                        i[idx['t']] = fr
-                    for ch, orig_ch in enumerate(channels):
-                        if 'c' in idx:
-                            i[idx['c']] = orig_ch
-                        current_status.reset("Reading image",
-                                current=1 + ch + fr * self._n_channels,
-                                total=self._n_images)
-                        self.img[ch, fr, :, :] = data5[tuple(i)]
+                self._alloc_img(dtype=data5.dtype)
+
+                # Read chunk-aligned slabs to decompress each chunk only once
+                slab_size = hdf5_frames_per_slab(data5, idx)
+                buf = None
+                for start in range(0, self._n_frames, slab_size):
+                    stop = min(start + slab_size, self._n_frames)
+                    current_status.reset("Reading image",
+                            current=stop * self._n_channels,
+                            total=self._n_images)
+                    slab, buf = read_hdf5_frames(data5, idx, channels, start, stop, buf)
+                    self.img[:, start:stop, :, :] = slab
 
         except Exception as e:
             self._clear_state()
@@ -330,19 +589,30 @@ class Stack:
             raise
 
         finally:
+            if h5 is not None:
+                h5.close()
             self._listeners.notify("image")
 
     def close(self):
         """Close the TIFF file."""
         with self.image_lock:
             self.img = None
+            self._close_backend()
             try:
                 self._tmpfile.close()
             except Exception:
                 pass
             self._tmpfile = None
+            self._closed = True
             self._clear_state()
 
+    def _close_backend(self):
+        """Close the lazy backend, if any"""
+        with self.image_lock:
+            if self._backend is not None:
+                self._backend.close()
+                self._backend = None
+
     def crop(self, *, top=0, bottom=0, left=0, right=0):
         """Crop image with specified margins"""
         new_height = self._height - (top + bottom)
@@ -366,11 +636,14 @@ class Stack:
                                            self._n_frames,
                                            new_height,
                                            new_width))
-                new_img[:, :, :, :] = self.img[:, :, top:bottom, left:right]
+                for ch in range(self._n_channels):
+                    for fr in range(self._n_frames):
+                        new_img[ch, fr, :, :] = self.img[ch, fr, top:bottom, left:right]
             except Exception:
                 new_tempfile.close()
                 raise
             self.img = new_img
+            self._close_backend()
             self._width = new_width
             self._height = new_height
             try:
@@ -420,7 +693,6 @@ class Stack:
 
         idx_C = dim_order.find('C')
         idx_T = dim_order.find('T')
-        print(idx_C, idx_T)
         if idx_C == -1 or idx_T == -1:
             raise ValueError("Bad 'DimensionOrder' value in OME description.")
         if idx_C < idx_T:
@@ -484,9 +756,9 @@ class Stack:
         with self.image_lock:
             return self.img[channel, frame, :, :].copy()
 
-    def get_frame_tk(self, channel, frame, convert_fcn=None):
+    def get_frame_uint8(self, channel, frame, convert_fcn=None):
         """
-        Get a frame of the stack as :py:class:`tkinter.PhotoImage`.
+        Get a frame of the stack as ``uint8`` array.
 
         :param channel: The channel of the requested stack position
         :type channel: int
@@ -502,7 +774,7 @@ class Stack:
         a (n_rows, n_columns)-shaped numpy array of ``uint8`` type.
 
         :return: the image at the requested stack position
-        :rtype: :py:class:`tkinter.PhotoImage`
+        :rtype: (n_rows, n_columns)-shaped :py:class:`numpy.ndarray` of ``uint8``
         """
         with self.image_lock:
             a0 = self.get_image(channel=channel, frame=frame)
@@ -514,7 +786,7 @@ class Stack:
                 a8 = np.zeros(a0.shape, dtype=np.uint8)
                 a8[a0] = 255
             elif self._mode.startswith('uint'):
-                a8 = a0 >> ((a0.itemsize - 1) * 8)
+                a8 = (a0 >> ((a0.itemsize - 1) * 8)).astype(np.uint8)
             elif self._mode.startswith('float'):
                 #TODO: normalize to global maximum
                 a0_min = a0.min()
@@ -526,7 +798,19 @@ class Stack:
                 a8 = (256 / (a0_max - a0_min) * (a0 - a0_min)).astype(np.uint8)
             else:
                 raise ValueError(f"Illegal image mode: {self._mode}")
-            return piltk.PhotoImage(pilimg.fromarray(a8, mode='L'))
+            return a8
+
+    def get_frame_tk(self, channel, frame, convert_fcn=None):
+        """
+        Get a frame of the stack as :py:class:`tkinter.PhotoImage`.
+
+        See :py:meth:`get_frame_uint8` for the parameters.
+
+        :return: the image at the requested stack position
+        :rtype: :py:class:`tkinter.PhotoImage`
+        """
+        a8 = self.get_frame_uint8(channel=channel, frame=frame, convert_fcn=convert_fcn)
+        return piltk.PhotoImage(pilimg.fromarray(a8, mode='L'))
 
     def clear_info(self):
         """Clear the image information"""
@@ -637,6 +921,12 @@ class Stack:
                 del self.__rois[key][frame]
             self._notify_roi_listeners()
 
+    @property
+    def closed(self):
+        """Whether the stack has been closed by `close`"""
+        with self.image_lock:
+            return self._closed
+
     @property
     def path(self):
         with self.image_lock:
@@ -677,6 +967,14 @@ class Stack:
         with self.image_lock:
             return self._n_frames
 
+    @property
+    def channel_indices(self):
+        """Tuple of the indices in the stack file of the loaded channels"""
+        with self.image_lock:
+            if self._channel_indices is None:
+                return tuple(range(self._n_channels))
+            return self._channel_indices
+
     @property
     def stacktype(self):
         return self._stacktype
@@ -1,15 +1,18 @@
 #! /usr/bin/env python3
 import base64
+from collections import OrderedDict
 import os
 import queue
 import sys
-from threading import Condition
+from threading import Condition, Lock, Thread
 import tkinter as tk
 import tkinter.filedialog as tkfdlg
 import tkinter.ttk as ttk
 import warnings
 
 import numpy as np
+import PIL.Image as pilimg
+import PIL.ImageTk as piltk
 
 from .contrast import ContrastAdjuster
 from .gui_tk import new_toplevel
@@ -38,6 +41,9 @@ SHOW_CONTRAST = 'contrast'
 SHOW_ROI = 'roi'
 SHOW_BROWSE = 'browse'
 
+FRAME_CACHE_SIZE = 64
+FRAME_PREFETCH = 8
+
 class StackViewer:
     """
     Provides a GUI for displaying a TIFF stack.
@@ -97,6 +103,8 @@ class StackViewer:
     * ``start_adjustment``
     * ``stop_adjustment``
     * ``close``
+
+    Displayed frames can be cached using :py:meth:`StackViewer.set_frame_cache`.
     """
     CMD_UPDATE_STACK = 'CMD_UPDATE_STACK'
     CMD_UPDATE_ROIS = 'CMD_UPDATE_ROIS'
@@ -141,6 +149,18 @@ class StackViewer:
         self.img_shape = None
         self.scale = None
 
+        # Frame cache
+        self._frame_cache = OrderedDict()
+        self._frame_cache_lock = Lock()
+        self._frame_cache_size = 0
+        self._frame_cache_prefetch = 0
+        self._frame_cache_key_fcn = None
+        self._frame_cache_render_fcn = None
+        self._frame_cache_generation = 0
+        self._last_cached_frame = None
+        self._prefetch_queue = None
+        self._prefetch_thread = None
+
         self.i_channel_var = tk.IntVar()
         self.i_channel_var.trace_add("write", self._i_channel_changed)
         self.i_frame_var = tk.IntVar()
@@ -390,13 +410,146 @@ class StackViewer:
         self.img = None
         self.img_shape = None
         self.scale = None
+        self.clear_frame_cache()
         self._update_stack_properties()
         if self.stack is not None:
             self.image_listener_id = self.stack.add_listener(
-                    lambda: self.schedule(self.update_stack_properties), 'image')
+                    self._image_changed, 'image')
             self.roi_listener_id = self.stack.add_listener(
                     lambda: self.schedule(self.draw_rois), 'roi')
 
+    def _image_changed(self):
+        """Listener callback for changes of the stack images"""
+        self.clear_frame_cache()
+        self.schedule(self.update_stack_properties)
+
+    def set_frame_cache(self, size=FRAME_CACHE_SIZE, prefetch=FRAME_PREFETCH, key_fcn=None, render_fcn=None):
+        """
+        Enable caching of displayed frames.
+
+        :param size: maximum number of cached frames; 0 disables the cache
+        :type size: int
+        :param prefetch: number of frames to be rendered in advance
+            in a background thread in the scrolling direction
+        :type prefetch: int
+        :param key_fcn: function returning a hashable object describing
+            the display settings that affect the rendered frames
+            (e.g. the display size); called from the Tkinter main thread
+        :type key_fcn: None or function
+        :param render_fcn: function ``render_fcn(channel, frame, settings)``
+            returning the frame as ``uint8`` array rendered with the display
+            settings ``settings`` returned by ``key_fcn``; if None,
+            :py:meth:`get_frame_uint8` of the stack is used
+        :type render_fcn: None or function
+
+        Frames are cached as ``uint8`` arrays. The cache is cleared
+        when the images of the stack change. While the contrast adjuster
+        is in use, the frames are cached with its settings, but not
+        prefetched.
+
+        Prefetching renders frames from a background thread,
+        so that ``render_fcn`` or the stack (including functions
+        of virtual channels) must be thread-safe.
+        """
+        self._frame_cache_size = size
+        self._frame_cache_prefetch = prefetch
+        self._frame_cache_key_fcn = key_fcn
+        self._frame_cache_render_fcn = render_fcn
+        self.clear_frame_cache()
+        if size and prefetch and self._prefetch_thread is None:
+            self._prefetch_queue = queue.Queue()
+            self._prefetch_thread = Thread(target=self._prefetch_loop, daemon=True)
+            self._prefetch_thread.start()
+
+    def clear_frame_cache(self):
+        """Delete all cached frames"""
+        with self._frame_cache_lock:
+            self._frame_cache.clear()
+            self._frame_cache_generation += 1
+
+    def contrast_settings_key(self):
+        """Get the settings of the contrast adjuster for the frame cache key.
+
+        Returns None if the contrast adjuster is not open.
+        """
+        if self.contrast_adjuster is None:
+            return None
+        return self.contrast_adjuster.settings_key()
+
+    def _frame_cache_key(self):
+        """Get the current display settings part of the frame cache key"""
+        if self._frame_cache_key_fcn is None:
+            return None
+        return self._frame_cache_key_fcn()
+
+    def _cache_frame(self, key, a8, generation):
+        """Insert a frame into the cache unless the cache was cleared"""
+        with self._frame_cache_lock:
+            if generation != self._frame_cache_generation:
+                return
+            self._frame_cache[key] = a8
+            self._frame_cache.move_to_end(key)
+            while len(self._frame_cache) > self._frame_cache_size:
+                self._frame_cache.popitem(last=False)
+
+    def _render_frame(self, stack, channel, frame, settings, convert_fcn=None):
+        """Render a frame for the frame cache with display settings `settings`"""
+        if self._frame_cache_render_fcn is None:
+            return stack.get_frame_uint8(channel=channel, frame=frame, convert_fcn=convert_fcn)
+        a8 = self._frame_cache_render_fcn(channel, frame, settings)
+        if convert_fcn is not None:
+            a8 = convert_fcn(a8)
+        return a8
+
+    def _get_frame_uint8(self, channel, frame, convert_fcn=None):
+        """Get a frame for display, using the frame cache if enabled"""
+        if not self._frame_cache_size:
+            return self.stack.get_frame_uint8(channel=channel, frame=frame, convert_fcn=convert_fcn)
+
+        settings = self._frame_cache_key()
+        key = (channel, frame, settings, self.contrast_settings_key())
+        with self._frame_cache_lock:
+            generation = self._frame_cache_generation
+            a8 = self._frame_cache.get(key)
+            if a8 is not None:
+                self._frame_cache.move_to_end(key)
+        if a8 is None:
+            a8 = self._render_frame(self.stack, channel, frame, settings, convert_fcn)
+            self._cache_frame(key, a8, generation)
+
+        # Prefetch frames in scrolling direction; the contrast adjuster
+        # reads Tkinter variables and cannot be used from another thread
+        if convert_fcn is None and self._prefetch_queue is not None and self._frame_cache_prefetch:
+            if self._last_cached_frame is not None and frame < self._last_cached_frame:
+                frames = range(frame - 1, max(frame - 1 - self._frame_cache_prefetch, -1), -1)
+            else:
+                frames = range(frame + 1, min(frame + 1 + self._frame_cache_prefetch, self.n_frames))
+            self._prefetch_queue.put((generation, self.stack, channel, settings, frames))
+        self._last_cached_frame = frame
+        return a8
+
+    def _prefetch_loop(self):
+        """Render frames in advance; runs in a background thread"""
+        while True:
+            job = self._prefetch_queue.get()
+            if job is None:
+                break
+            generation, stack, channel, settings, frames = job
+            for fr in frames:
+                if not self._prefetch_queue.empty() or \
+                        generation != self._frame_cache_generation:
+                    # Skip outdated jobs
+                    break
+                key = (channel, fr, settings, None)
+                with self._frame_cache_lock:
+                    if key in self._frame_cache:
+                        continue
+                try:
+                    a8 = self._render_frame(stack, channel, fr, settings)
+                except Exception:
+                    break
+                self._cache_frame(key, a8, generation)
+
     def _show_img(self):
         """Update the image shown."""
         if self.contrast_adjuster is None:
@@ -404,9 +557,10 @@ class StackViewer:
         else:
             convert_fcn = self.contrast_adjuster.convert
 
-        self.img = self.stack.get_frame_tk(channel=self.i_channel,
-                                           frame=self.i_frame,
-                                           convert_fcn=convert_fcn)
+        a8 = self._get_frame_uint8(channel=self.i_channel,
+                                   frame=self.i_frame,
+                                   convert_fcn=convert_fcn)
+        self.img = piltk.PhotoImage(pilimg.fromarray(a8, mode='L'))
         new_shape = np.array(((self.img.height(), self.img.width()),))
         if self.img_shape is None or \
                 not (self.img_shape == new_shape).all():
@@ -810,6 +964,12 @@ class StackViewer:
             return
         self.closing_state = True
 
+        if self._prefetch_queue is not None:
+            self._prefetch_queue.put(None)
+            self._prefetch_queue = None
+            self._prefetch_thread = None
+        self.clear_frame_cache()
+
         if self.contrast_adjuster is not None:
             self.contrast_adjuster.close(isDisplayUpdate=False)
             self.contrast_adjuster = None
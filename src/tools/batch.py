@@ -0,0 +1,177 @@
+"""Headless tracking and readout of multiple positions in parallel."""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+import os
+import os.path as op
+
+from ..session.status import DummyStatus
+from ..stack import types as ty
+
+SESSION_FILENAME = "session.zip"
+
+
+def _channel_spec(spec):
+    """Split a channel specification into path and channel index.
+
+    `spec` is either a str with the path of the stack
+    or a tuple (path, channel index).
+    """
+    if isinstance(spec, str):
+        return spec, 0
+    path, channel = spec
+    return path, channel
+
+
+def position_name(segmentation):
+    """Default name of a position, derived from the segmentation stack"""
+    path, _ = _channel_spec(segmentation)
+    return op.splitext(op.basename(path))[0]
+
+
+def process_position(segmentation, fluorescence=(), save_dir=None, microscope_name=None,
+        microscope_resolution=None, n_threads=None, status=None):
+    """Track cells and read out traces of one position.
+
+    Arguments:
+        segmentation -- channel specification of the segmented stack
+        fluorescence -- list of channel specifications of fluorescence channels
+        save_dir -- str, directory to which the session is written
+                    with `StackdataIO.dump`; if None, nothing is written
+        microscope_name -- str, name of the microscope/objective
+        microscope_resolution -- float, image resolution in [µm/px]
+        n_threads -- int, number of threads for reading, tracking and
+                     readout; defaults to the number of CPUs
+        status -- Status instance for displaying progress
+
+    A channel specification is either the path of a stack file,
+    using its first channel, or a tuple (path, channel index).
+
+    Returns the `SessionModel` holding the traces.
+    """
+    from ..session.model import SessionModel
+    if status is None:
+        status = DummyStatus()
+
+    model = SessionModel()
+    model.n_workers = n_threads
+    channels = [(segmentation, ty.TYPE_SEGMENTATION)]
+    channels.extend((spec, ty.TYPE_FLUORESCENCE) for spec in fluorescence)
+
+    # Open stacks with only the used channels
+    stack_channels = {}
+    for spec, _ in channels:
+        path, i_channel = _channel_spec(spec)
+        stack_channels.setdefault(path, set()).add(i_channel)
+    stack_ids = {}
+    for path, used in stack_channels.items():
+        used = sorted(used)
+        stack_ids[path] = model.open_stack(path, status=status, channels=used), used
+
+    chan_info = []
+    for spec, type_ in channels:
+        path, i_channel = _channel_spec(spec)
+        stack_id, used = stack_ids[path]
+        stack_dir, stack_name = op.split(path)
+        chan_info.append({'stack_id': stack_id,
+                          'name': stack_name,
+                          'dir': stack_dir,
+                          'i_channel': used.index(i_channel),
+                          'label': None,
+                          'type': type_,
+                         })
+
+    model.config(chan_info, status=status, streaming=True)
+    if microscope_resolution:
+        model.set_microscope(name=microscope_name, resolution=microscope_resolution, status=status)
+
+    if save_dir is not None:
+        with status("Saving session …"):
+            os.makedirs(save_dir, exist_ok=True)
+            model.to_stackio().dump(save_dir, SESSION_FILENAME)
+    return model
+
+
+def _position_worker(segmentation, fluorescence, save_dir, microscope_name, microscope_resolution,
+        n_threads):
+    """Process a position in a worker process and close its stacks"""
+    model = process_position(segmentation, fluorescence, save_dir=save_dir,
+                             microscope_name=microscope_name,
+                             microscope_resolution=microscope_resolution,
+                             n_threads=n_threads)
+    model.close_stacks()
+    return op.join(save_dir, SESSION_FILENAME)
+
+
+def process_positions(positions, out_dir, n_workers=None, microscope_name=None,
+        microscope_resolution=None, status=None):
+    """Track cells and read out traces of multiple positions in parallel.
+
+    Arguments:
+        positions -- list of tuples (segmentation, fluorescence) with
+                     the channel specifications of each position,
+                     see `process_position`. Optionally, a third element
+                     gives the position name.
+        out_dir -- str, directory in which a subdirectory named
+                   by the position name is created for each position
+        n_workers -- number of worker processes; defaults to the number of CPUs.
+                     If 1, the positions are processed in the current process.
+        microscope_name, microscope_resolution -- see `process_position`
+        status -- Status instance for displaying progress
+
+    The positions are processed independently, each in one worker process.
+    The CPUs are divided among the worker processes, so that each process
+    uses `cpu_count // n_workers` threads, but at least one.
+    A failing position does not abort the other positions.
+
+    Returns a list with the path of the written session file for each
+    position, or None if processing the position failed.
+    """
+    if status is None:
+        status = DummyStatus()
+    n_cpus = os.cpu_count() or 1
+    if n_workers is None:
+        n_workers = n_cpus
+
+    n_jobs = len(positions)
+    n_processes = min(n_workers, n_jobs) if n_workers >= 2 and n_jobs >= 2 else 1
+    n_threads = max(n_cpus // n_processes, 1)
+
+    jobs = []
+    for pos in positions:
+        if len(pos) > 2:
+            segmentation, fluorescence, name = pos
+        else:
+            segmentation, fluorescence = pos
+            name = position_name(segmentation)
+        jobs.append((segmentation, tuple(fluorescence), op.join(out_dir, name),
+                     microscope_name, microscope_resolution, n_threads))
+    if len(set(job[2] for job in jobs)) != len(jobs):
+        raise ValueError("Position names are not unique.")
+
+    results = [None] * n_jobs
+    with status("Processing positions", current=0, total=n_jobs) as current_status:
+        if n_processes < 2:
+            for i, job in enumerate(jobs):
+                try:
+                    results[i] = _position_worker(*job)
+                except Exception as e:
+                    print(f"Processing position '{job[2]}' failed: {e!r}")
+                current_status.reset(msg="Processing positions", current=i+1, total=n_jobs)
+            return results
+
+        ctx = mp.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=n_processes, mp_context=ctx) as executor:
+            futures = {executor.submit(_position_worker, *job): i for i, job in enumerate(jobs)}
+            try:
+                for n_done, fut in enumerate(as_completed(futures), start=1):
+                    i = futures[fut]
+                    try:
+                        results[i] = fut.result()
+                    except Exception as e:
+                        print(f"Processing position '{jobs[i][2]}' failed: {e!r}")
+                    current_status.reset(msg="Processing positions", current=n_done, total=n_jobs)
+            except BaseException:
+                for fut in futures:
+                    fut.cancel()
+                raise
+    return results
@@ -1,20 +1,56 @@
 import time
 
+import numpy as np
 import tifffile
 
 from .binarize import binarize_phasecontrast_stack
 from ..img_op import background_correction as bgcorr
 from ..session.status import DummyStatus
 
-def perform_background_correction(chan_fl, chan_bin, outfile, status=None):
+class ChannelFrames:
+    """Read-only sequence of the frames of one channel of a stack.
+
+    `stack` -- `Stack` or `MetaStack`
+    `channel` -- index of the channel in `stack`
+
+    The frames are read from the stack upon access.
+    """
+    def __init__(self, stack, channel):
+        self.stack = stack
+        self.channel = channel
+
+    def __len__(self):
+        return self.stack.n_frames
+
+    def __getitem__(self, frame):
+        return self.stack.get_image(channel=self.channel, frame=frame)
+
+
+def perform_background_correction(chan_fl, chan_bin, outfile, status=None, mem_lim=None):
+    """Perform background correction and write the result to a TIFF file.
+
+    `chan_fl` -- the fluorescence channel; (frames x height x width) array
+                 or sequence of frames such as `ChannelFrames`
+    `chan_bin` -- the segmentation of the fluorescence channel; like `chan_fl`
+    `outfile` -- path of the TIFF file to be written
+    `status` -- Status instance for displaying progress
+    `mem_lim` -- memory limit, see `background_schwarzfischer_streaming`
+
+    The frames are corrected and written one by one, so that
+    the channels need not fit into memory.
+    """
     if status is None:
         status = DummyStatus()
 
     with status("Performing background correction …"):
-        chan_corr = bgcorr.background_schwarzfischer(chan_fl, chan_bin)
-        n_frames, height, width = chan_corr.shape
+        n_frames = len(chan_fl)
+        height, width = np.shape(chan_fl[0])
         tiff_shape = (n_frames, 1, 1, height, width, 1)
-        tifffile.imwrite(outfile, chan_corr.reshape(tiff_shape), shape=tiff_shape, imagej=True)
+
+        def write_tiff(frames):
+            tifffile.imwrite(outfile, frames, shape=tiff_shape, dtype=np.float32, imagej=True)
+
+        bgcorr.background_schwarzfischer_streaming(chan_fl, chan_bin, write_tiff, mem_lim=mem_lim, status=status)
         print(f"Background correction written to {outfile}")
 
     with status("Finished background correction"):
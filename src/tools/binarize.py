@@ -1,23 +1,108 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing as mp
+import os
 import os.path as op
+import tempfile
 import time
 
 import numpy as np
 import tifffile as tiff
 
+from .. import util
 from ..session.status import DummyStatus
 from ..img_op.coarse_binarize_phc import binarize_frame
-from ..img_op.cellpose_segmentation import binarize_frame_cellpose
-
-def binarize_phasecontrast_stack(stack, i_channel, outfile=None, status=None, return_result=False):
-    
+from ..img_op.cellpose_segmentation import CellposeSegmenter
+
+# State of binarization worker processes, set by `_init_binarize_worker`
+_worker_stack = None
+_worker_out = None
+
+
+def _init_binarize_worker(path, channel, out_path, shape):
+    """Open input stack and output memmap in a worker process"""
+    global _worker_stack, _worker_out
+    from ..stack import Stack
+    _worker_stack = Stack(path, channels=[channel], lazy=True, status=DummyStatus())
+    if (_worker_stack.n_frames, _worker_stack.height, _worker_stack.width) != shape:
+        raise ValueError(f"Stack in file '{path}' does not match the loaded stack")
+    _worker_out = np.memmap(out_path, dtype=np.uint8, mode='r+', shape=shape)
+
+
+def _binarize_worker(i_frame):
+    """Binarize a frame in a worker process"""
+    _worker_out[i_frame, ...] = binarize_frame(_worker_stack.get_image(frame=i_frame, channel=0))
+    return i_frame
+
+
+def _binarize_parallel(stack, i_channel, current_status, n_workers=None):
+    """Binarize frames of `stack` in a process pool.
+
+    The worker processes read the frames from the stack file
+    and write the binarized frames into a shared memory-mapped file.
+
+    Returns the binarized stack. Raises `BrokenProcessPool` when
+    the worker processes cannot be set up.
+    """
+    shape = (stack.n_frames, stack.height, stack.width)
+    fd, out_path = tempfile.mkstemp(suffix='.bin', dir=util.get_disk_temp_dir())
+    os.close(fd)
+    try:
+        out = np.memmap(out_path, dtype=np.uint8, mode='w+', shape=shape)
+        ctx = mp.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=n_workers,
+                                 mp_context=ctx,
+                                 initializer=_init_binarize_worker,
+                                 initargs=(stack.path, stack.channel_indices[i_channel], out_path, shape),
+                                ) as executor:
+            futures = [executor.submit(_binarize_worker, i_frame) for i_frame in range(stack.n_frames)]
+            try:
+                for i, fut in enumerate(as_completed(futures), start=1):
+                    fut.result()
+                    current_status.reset(msg="Binarizing frame", current=i, total=stack.n_frames)
+            except BaseException:
+                for fut in futures:
+                    fut.cancel()
+                raise
+        stack_bin = np.array(out)
+        del out
+        return stack_bin
+    finally:
+        try:
+            os.remove(out_path)
+        except OSError:
+            pass
+
+
+def binarize_phasecontrast_stack(stack, i_channel, outfile=None, status=None, return_result=False, n_workers=None):
+    """Binarize a phase-contrast channel of a stack.
+
+    `stack` -- the `Stack` holding the phase-contrast channel
+    `i_channel` -- index of the phase-contrast channel in `stack`
+    `outfile` -- optional file name for saving the binarized stack (TIFF, NPY or NPZ)
+    `status` -- Status instance for displaying progress
+    `return_result` -- if True, return the binarized stack
+    `n_workers` -- number of worker processes; defaults to the number of CPUs.
+                   If 1, or if the stack was not loaded from a file,
+                   the frames are binarized in the current process.
+    """
     if status is None:
         status = DummyStatus()
 
-    stack_bin = np.empty((stack.n_frames, stack.height, stack.width), dtype=np.uint8)
     with status("Binarizing …") as current_status:
-        for i_frame in range(stack.n_frames):
-            current_status.reset(msg="Binarizing frame", current=i_frame+1, total=stack.n_frames)
-            stack_bin[i_frame, ...] = binarize_frame(stack.get_image(frame=i_frame, channel=i_channel))
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        stack_bin = None
+        if n_workers > 1 and stack.path is not None and stack.n_frames > 1:
+            try:
+                stack_bin = _binarize_parallel(stack, i_channel, current_status, n_workers)
+            except BrokenProcessPool as e:
+                print(f"Parallel binarization failed, falling back to serial binarization: {e}")
+        if stack_bin is None:
+            stack_bin = np.empty((stack.n_frames, stack.height, stack.width), dtype=np.uint8)
+            for i_frame in range(stack.n_frames):
+                current_status.reset(msg="Binarizing frame", current=i_frame+1, total=stack.n_frames)
+                stack_bin[i_frame, ...] = binarize_frame(stack.get_image(frame=i_frame, channel=i_channel))
 
         if outfile:
             current_status.reset(f"Saving binarized stack to '{outfile}' …")
@@ -39,15 +124,25 @@ def binarize_phasecontrast_stack(stack, i_channel, outfile=None, status=None, re
 
         time.sleep(2)
 
-def segment_with_cellpose(stack, i_channel, outfile=None, status=None, return_result=False):
+def segment_with_cellpose(stack, i_channel, outfile=None, status=None, return_result=False, segmenter=None):
+    """Binarize a phase-contrast channel of a stack using Cellpose.
+
+    `segmenter` -- `CellposeSegmenter` instance; if None, a new segmenter is created.
+                   Re-use the segmenter to avoid re-loading the model.
+    For the other arguments, see `binarize_phasecontrast_stack`.
+    """
     if status is None:
         status = DummyStatus()
+    if segmenter is None:
+        segmenter = CellposeSegmenter()
 
     stack_bin = np.empty((stack.n_frames, stack.height, stack.width), dtype=np.uint8)
     with status("Binarizing …") as current_status:
-        for i_frame in range(stack.n_frames):
-            current_status.reset(msg="Segmenting with cellpose", current=i_frame+1, total=stack.n_frames)
-            stack_bin[i_frame, ...] = binarize_frame_cellpose(stack.get_image(frame=i_frame, channel=i_channel))
+        for start in range(0, stack.n_frames, segmenter.batch_size):
+            stop = min(start + segmenter.batch_size, stack.n_frames)
+            current_status.reset(msg="Segmenting with cellpose", current=stop, total=stack.n_frames)
+            imgs = [stack.get_image(frame=i_frame, channel=i_channel) for i_frame in range(start, stop)]
+            stack_bin[start:stop, ...] = segmenter.binarize(imgs)
 
         if outfile:
             current_status.reset(f"Saving binarized stack to '{outfile}' …")
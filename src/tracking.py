@@ -1,6 +1,9 @@
-import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
 
 import numpy as np
+import scipy.sparse as sparse
 import skimage.measure as skmeas
 
 from .stack import Stack
@@ -10,6 +13,28 @@ IGNORE_SIZE = 300
 MIN_SIZE = 1000
 MAX_SIZE = 10000
 
+ENGINE_OVERLAP = 'overlap'
+ENGINE_BBOX = 'bbox'
+
+REGION_DTYPE = np.dtype([('label', np.int64),
+                         ('area', np.int64),
+                         ('y_min', np.int32),
+                         ('x_min', np.int32),
+                         ('y_max', np.int32),
+                         ('x_max', np.int32),
+                         ('edge', np.bool_),
+                         ('offset', np.int64),
+                        ])
+
+CHECKS_DTYPE = np.dtype([('label', np.int64),
+                         ('area', np.int64),
+                         ('good', np.bool_),
+                         ('edge', np.bool_),
+                         ('ignore', np.bool_),
+                         ('small', np.bool_),
+                         ('large', np.bool_),
+                        ])
+
 def intercalation_iterator(n):
     """Generator function for iterating from both ends in `n` steps"""
     n = int(n)
@@ -53,6 +78,89 @@ def check_coordinate_overlap(coords1, coords2):
             return True
     return False
 
+def overlap_matrix(labels1, labels2):
+    """Calculate the overlap (contingency) matrix of two label images
+
+    Arguments:
+        `labels1` and `labels2` are label images of same shape
+        with non-negative integer labels; 0 is background.
+
+    Returns:
+        A `scipy.sparse.csr_matrix` with sorted indices, whose element
+        [l1, l2] is the number of pixels with label l1 in `labels1`
+        and label l2 in `labels2`. Background pixels are not counted.
+    """
+    labels1 = np.asarray(labels1).ravel()
+    labels2 = np.asarray(labels2).ravel()
+    is_fg = (labels1 != 0) & (labels2 != 0)
+    l1 = labels1[is_fg]
+    l2 = labels2[is_fg]
+    shape = (int(labels1.max(initial=0)) + 1, int(labels2.max(initial=0)) + 1)
+    ovl = sparse.coo_matrix((np.ones(l1.size, dtype=np.int64), (l1, l2)), shape=shape).tocsr()
+    ovl.sum_duplicates()
+    return ovl
+
+
+def region_table(labels):
+    """Extract compact region data from a label image
+
+    Arguments:
+        `labels` is a label image with non-negative integer labels;
+        0 is background.
+
+    Returns:
+        A tuple of the region table and the coordinates.
+        The region table is a structured array of dtype `REGION_DTYPE`
+        with one element per region, sorted by label. The bounding box
+        is given as in `RegionProperties.bbox` (maximum exclusive).
+        'edge' indicates whether the region touches the image border.
+        The coordinates are an n-by-2 array of (row, column) of all
+        foreground pixels, grouped by region. The coordinates of a
+        region are found in the slice from 'offset' of length 'area'
+        and are ordered as in `RegionProperties.coords`.
+    """
+    labels = np.asarray(labels)
+    height, width = labels.shape
+    flat = labels.ravel()
+    idx = np.flatnonzero(flat)
+    idx = idx[np.argsort(flat[idx], kind='stable')]
+    sorted_labels = flat[idx]
+    rows, cols = np.divmod(idx, width)
+    coords = np.stack((rows, cols), axis=1).astype(np.int32)
+
+    is_start = np.ones(idx.size, dtype=bool)
+    is_start[1:] = sorted_labels[1:] != sorted_labels[:-1]
+    starts = np.flatnonzero(is_start)
+    table = np.empty(starts.size, dtype=REGION_DTYPE)
+    if not starts.size:
+        return table, coords
+    table['label'] = sorted_labels[starts]
+    table['offset'] = starts
+    table['area'] = np.diff(np.append(starts, idx.size))
+    table['y_min'] = rows[starts]
+    table['y_max'] = np.maximum.reduceat(rows, starts) + 1
+    table['x_min'] = np.minimum.reduceat(cols, starts)
+    table['x_max'] = np.maximum.reduceat(cols, starts) + 1
+    table['edge'] = (table['y_min'] == 0) | (table['x_min'] == 0) | \
+            (table['y_max'] == height) | (table['x_max'] == width)
+    return table, coords
+
+
+class Region:
+    """Data of one region of a region table
+
+    Provides the attributes `label`, `area`, `bbox` and `coords`
+    like `RegionProperties`.
+    """
+    __slots__ = ('label', 'area', 'bbox', 'edge', 'coords')
+
+    def __init__(self, row, coords):
+        self.label = int(row['label'])
+        self.area = int(row['area'])
+        self.bbox = (int(row['y_min']), int(row['x_min']), int(row['y_max']), int(row['x_max']))
+        self.edge = bool(row['edge'])
+        self.coords = coords[row['offset']:row['offset']+row['area']]
+
 
 class Tracker:
     """Performs tracking in multithreaded fashion.
@@ -62,11 +170,21 @@ class Tracker:
         labeled_stack -- a Stack with each cell having a unique label (per frame)
     In both cases, background is 0.
     Only one of both arguments needs be given.
+    The frames are labeled and their region tables are extracted
+    in `n_workers` threads (default: number of CPUs).
     The labeled stack can be created using `Tracker.label`.
+
+    The tracking engine is chosen by `engine`:
+        ENGINE_OVERLAP -- find parents by the overlap matrix of the
+                          label images of consecutive frames (default)
+        ENGINE_BBOX -- find parents by comparing bounding boxes and
+                       coordinates of the regions
+    Both engines yield identical traces.
     """
 
     def __init__(self, segmented_stack=None, labeled_stack=None, make_labeled_stack=False, ignore_size=IGNORE_SIZE,
-            min_size=MIN_SIZE, max_size=MAX_SIZE, preprocessing=None, segmented_chan=None, labeled_chan=None, status=None):
+            min_size=MIN_SIZE, max_size=MAX_SIZE, preprocessing=None, segmented_chan=None, labeled_chan=None, status=None,
+            engine=ENGINE_OVERLAP, n_workers=None):
         self.stack_seg = segmented_stack
         if segmented_chan is None:
             self.segmented_chan = 0
@@ -84,11 +202,19 @@ class Tracker:
         self.min_size = min_size
         self.max_size = max_size
         self.ignore_size = ignore_size
-        self.props = None
+        self.regions = None
+        self._overlaps = {}
+        self._last_lbl_img = None
+        self._label_images = {}
+        self.n_workers = n_workers
         self.traces = None
         self.traces_selection = None
+        self.traces_regions = None
         self.make_labeled_stack = make_labeled_stack
         self.preprocessing = preprocessing
+        if engine not in (ENGINE_OVERLAP, ENGINE_BBOX):
+            raise ValueError(f"Unknown tracking engine: {engine}")
+        self.engine = engine
 
         if self.stack_seg is not None:
             self.n_frames = self.stack_seg.n_frames
@@ -120,46 +246,132 @@ class Tracker:
             img = self.preprocessing(img)
         return skmeas.label(img, connectivity=1)
 
+    def _read_frame_regions(self, fr):
+        """Label frame `fr` and extract its region table
+
+        Label images given to `update_frame` take precedence
+        over the stacks.
+        """
+        try:
+            img = self._label_images[fr]
+        except KeyError:
+            pass
+        else:
+            return region_table(img)
+        if self.stack_lbl is None:
+            if self.stack_seg.closed:
+                raise ValueError("The segmented stack has been closed; frames cannot be read again.")
+            img = self.label(self.stack_seg.get_image(channel=self.segmented_chan, frame=fr))
+        else:
+            if self.stack_lbl.closed:
+                raise ValueError("The labeled stack has been closed; frames cannot be read again.")
+            img = self.stack_lbl.get_image(channel=self.labeled_chan, frame=fr)
+        return region_table(img)
+
     def read_regionprops(self):
-        self.props = {}
-        for fr in range(self.n_frames):
-            with self.status(msg="Reading region props", current=fr+1, total=self.n_frames):
-                if self.stack_lbl is None:
-                    img = self.label(self.stack_seg.get_image(channel=self.segmented_chan, frame=fr))
-                else:
-                    img = self.stack_lbl.get_image(channel=self.labeled_chan, frame=fr)
-                props = skmeas.regionprops(img)
-                this_props = {}
-                for p in props:
-                    this_props[p.label] = p
-                self.props[fr] = this_props
+        """Extract the region tables of all frames in parallel"""
+        self.regions = {}
+        self._overlaps = {}
+        n_workers = self.n_workers if self.n_workers is not None else os.cpu_count()
+        with self.status(msg="Reading region props", current=0, total=self.n_frames) as current_status, \
+                ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures = {executor.submit(self._read_frame_regions, fr): fr for fr in range(self.n_frames)}
+            try:
+                for i, fut in enumerate(as_completed(futures), start=1):
+                    self.regions[futures[fut]] = fut.result()
+                    current_status.reset(msg="Reading region props", current=i, total=self.n_frames)
+            except BaseException:
+                for fut in futures:
+                    fut.cancel()
+                raise
+
+    def get_regions(self, fr):
+        """Get a dict of `Region` objects of frame `fr`, with labels as keys"""
+        table, coords = self.regions[fr]
+        return {int(row['label']): Region(row, coords) for row in table}
+
+    @property
+    def props(self):
+        """Dict of region dicts (see `get_regions`) with frame indices as keys"""
+        if self.regions is None:
+            return None
+        return {fr: self.get_regions(fr) for fr in sorted(self.regions.keys())}
+
+    def get_coords(self, fr, i):
+        """Get the coordinates of the region in row `i` of the region table of frame `fr`"""
+        return self._coords(self.regions[fr], i)
+
+    @staticmethod
+    def _coords(regions, i):
+        """Get the coordinates of row `i` of region table and coordinates `regions`"""
+        table, coords = regions
+        start = table['offset'][i]
+        return coords[start:start+table['area'][i]]
+
+    @staticmethod
+    def _detached_region(regions, i):
+        """Get a `Region` of row `i` of `regions` not sharing memory with `regions`"""
+        table, coords = regions
+        region = Region(table[i], coords)
+        region.coords = region.coords.copy()
+        return region
 
     def get_bboxes(self, fr):
         """Build a dictionary with bounding boxes of ROIs in frame `fr`"""
-        this_props = self.props[fr]
-        n = len(this_props)
-        i = 0
-        labels = np.empty(n, dtype=np.object)
-        props = np.empty(n, dtype=np.object)
-        y_min = np.empty(n, dtype=np.int32)
-        x_min = np.empty(n, dtype=np.int32)
-        y_max = np.empty(n, dtype=np.int32)
-        x_max = np.empty(n, dtype=np.int32)
-        for lbl, p in this_props.items():
-            labels[i] = lbl
-            props[i] = p
-            y_min[i], x_min[i], y_max[i], x_max[i] = p.bbox
-            i += 1
+        return self._bboxes(self.regions[fr][0], fr)
+
+    @staticmethod
+    def _bboxes(table, fr):
+        """Build a bboxes dictionary from region table `table` of frame `fr`"""
         return {
-                'n': n,
-                'labels': labels,
-                'props': props,
-                'y_min': y_min,
-                'x_min': x_min,
-                'y_max': y_max,
-                'x_max': x_max,
+                'n': table.size,
+                'frame': fr,
+                'labels': table['label'],
+                'index': np.arange(table.size),
+                'y_min': table['y_min'],
+                'x_min': table['x_min'],
+                'y_max': table['y_max'],
+                'x_max': table['x_max'],
                }
 
+    def get_label_image(self, fr):
+        """Build the label image of frame `fr` from the region table"""
+        return self._label_image(self.regions[fr])
+
+    def _label_image(self, regions):
+        """Build a label image from region table and coordinates `regions`"""
+        table, coords = regions
+        img = np.zeros((self.height, self.width), dtype=np.int64)
+        img[coords[:, 0], coords[:, 1]] = np.repeat(table['label'], table['area'])
+        return img
+
+    def _overlap_matrix(self, fr, prev_regions, new_regions):
+        """Get the overlap matrix of frame `fr` with frame `fr - 1`
+
+        `prev_regions` and `new_regions` are the region tables and
+        coordinates of the frames `fr - 1` and `fr`, respectively.
+
+        If the region tables are stored in `regions`, the overlap matrix
+        is cached until the region table of one of the frames changes.
+        """
+        use_cache = self.regions is not None and self.regions.get(fr) is new_regions
+        if use_cache:
+            try:
+                return self._overlaps[fr]
+            except KeyError:
+                pass
+        # The label image of `new_regions` is kept for the next frame
+        if self._last_lbl_img is not None and self._last_lbl_img[0] is prev_regions:
+            prev_lbl_img = self._last_lbl_img[1]
+        else:
+            prev_lbl_img = self._label_image(prev_regions)
+        new_lbl_img = self._label_image(new_regions)
+        self._last_lbl_img = (new_regions, new_lbl_img)
+        ovl = overlap_matrix(new_lbl_img, prev_lbl_img)
+        if use_cache:
+            self._overlaps[fr] = ovl
+        return ovl
+
     def update_bboxes(self, bb, keys):
         """Remove all entries from bboxes instance `bb` that are not in `keys`"""
         idx = np.isin(bb['labels'], keys)
@@ -167,114 +379,203 @@ class Tracker:
             return bb
         bb['n'] = np.sum(idx)
         bb['labels'] = bb['labels'][idx]
-        bb['props'] = bb['props'][idx]
+        bb['index'] = bb['index'][idx]
         bb['y_min'] = bb['y_min'][idx]
         bb['x_min'] = bb['x_min'][idx]
         bb['y_max'] = bb['y_max'][idx]
         bb['x_max'] = bb['x_max'][idx]
         return bb
 
-    def track(self):
-        """Track the cells through the stack."""
-        # `traces` holds for each cell a list with the labels for each frame.
+    def get_checks(self, fr, edges=True):
+        """Get the quality checks of all regions of frame `fr`
+
+        Returns a structured array of dtype `CHECKS_DTYPE` with the
+        same rows as the region table of frame `fr`.
+        If `edges` is False, regions touching the image border
+        are not marked as edge regions.
+        """
+        return self._checks(self.regions[fr][0], edges=edges)
+
+    def _checks(self, table, edges=True):
+        """Get the quality checks of the regions in region table `table`"""
+        area = table['area']
+        checks = np.zeros(table.size, dtype=CHECKS_DTYPE)
+        checks['label'] = table['label']
+        checks['area'] = area
+        if edges:
+            checks['edge'] = table['edge']
+        if self.max_size:
+            checks['large'] = area > self.max_size
+        if self.min_size:
+            checks['small'] = area < self.min_size
+            if self.ignore_size:
+                checks['ignore'] = checks['small'] & (area <= self.ignore_size)
+        checks['good'] = ~(checks['edge'] | checks['large'] | checks['small'])
+        return checks
+
+    @staticmethod
+    def _selection_from_checks(ck):
+        """Get initial selection state of region with checks `ck`
+
+        Returns None for edge regions, else whether the region is good.
+        """
+        if ck['edge']:
+            return None
+        return bool(ck['good'])
+
+    def iter_frame_regions(self):
+        """Iterate over the region tables of all frames in order.
+
+        Yields tuples of region table and coordinates (see `region_table`).
+        If the region tables have not been read by `read_regionprops`,
+        they are extracted on the fly in `n_workers` threads, reading
+        at most `n_workers` frames ahead, so that memory usage does not
+        depend on the number of frames.
+        """
+        if self.regions is not None:
+            for fr in range(self.n_frames):
+                yield self.regions[fr]
+            return
+
+        n_workers = self.n_workers if self.n_workers is not None else os.cpu_count()
+        if n_workers < 2:
+            for fr in range(self.n_frames):
+                yield self._read_frame_regions(fr)
+            return
+
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures = deque()
+            try:
+                for fr in range(self.n_frames):
+                    futures.append(executor.submit(self._read_frame_regions, fr))
+                    if len(futures) >= n_workers:
+                        yield futures.popleft().result()
+                while futures:
+                    yield futures.popleft().result()
+            finally:
+                for fut in futures:
+                    fut.cancel()
+
+    def iter_traces(self, frame_regions=None, with_regions=False):
+        """Track the cells through the stack, yielding traces when finished.
+
+        `frame_regions` -- iterable of region tables and coordinates
+                           of the frames in order; defaults to
+                           `iter_frame_regions()`
+        `with_regions` -- bool, whether to yield the regions of the traces
+
+        Yields tuples `(trace, selection)`, where `trace` is a list of
+        the labels of the cell, starting at the first frame, and
+        `selection` is True, False or None (untrackable).
+        If `with_regions` is True, the tuples additionally contain
+        a list of the `Region` objects of the cell in each frame.
+        A trace is yielded as soon as it is not continued in a frame;
+        in this case it is shorter than the stack.
+        Traces spanning the whole stack are yielded in order after
+        the last frame.
+
+        Only the data of the current and the previous frame are kept
+        in memory, besides the traces that are still being continued.
+        """
+        if frame_regions is None:
+            frame_regions = self.iter_frame_regions()
+
+        # `traces` maps trace indices to a list with the labels for each frame.
         # `traces_selection` holds a size-based selection for the elements of `traces` with same indices.
         # `prev_idx` maps the labels of the cells in the last iteration to an index in `traces`.
-        traces = []
-        traces_selection = []
-        prev_checks = {}
+        # `prev_checks` holds the checks of the regions of the last iteration,
+        # with the same rows as the region table.
+        traces = {}
+        traces_selection = {}
+        traces_regions = {}
         prev_idx = {}
 
         # Initialization for first frame
-        tic0 = time.time() #DEBUG
+        frame_regions = iter(frame_regions)
         with self.status(msg="Tracking cells", current=1, total=self.n_frames):
-            tic = time.time() #DEBUG
-            new_bbox = self.get_bboxes(0)
-            for i in range(new_bbox['n']):
-                ck = self._get_trace_checks(new_bbox['props'][i])
-                if ck['ignore']:
-                    continue
-                elif ck['edge']:
-                    is_select = None
-                elif ck['good']:
-                    is_select = True
-                else:
-                    is_select = False
-                lbl = new_bbox['labels'][i]
-                prev_checks[lbl] = ck
-                prev_idx[lbl] = len(traces)
-                traces.append([lbl])
-                traces_selection.append(is_select)
-        print("Frame 001: {:.4f}s".format(time.time() - tic)) #DEBUG
+            new_regions = next(frame_regions)
+            new_bbox = self._bboxes(new_regions[0], 0)
+            new_checks = self._checks(new_regions[0])
+            for i in np.flatnonzero(~new_checks['ignore']):
+                lbl = int(new_checks['label'][i])
+                trace_idx = len(traces)
+                prev_idx[lbl] = trace_idx
+                traces[trace_idx] = [lbl]
+                traces_selection[trace_idx] = self._selection_from_checks(new_checks[i])
+                if with_regions:
+                    traces_regions[trace_idx] = [self._detached_region(new_regions, i)]
 
         # Track further frames
-        for fr in range(1, self.n_frames):
-            new_checks = {}
+        for fr, regions in enumerate(frame_regions, start=1):
             new_idx = {}
             with self.status(msg="Tracking cells", current=fr + 1, total=self.n_frames):
-                tic = time.time() #DEBUG
 
-                # Compare bounding boxes
+                prev_regions = new_regions
+                new_regions = regions
                 prev_bbox = self.update_bboxes(new_bbox, (*prev_idx.keys(),))
-                new_bbox = self.get_bboxes(fr)
-                overlaps = np.logical_and(
-                    np.logical_and(
-                        new_bbox['y_min'].reshape((-1, 1)) < prev_bbox['y_max'].reshape((1, -1)),
-                        new_bbox['y_max'].reshape((-1, 1)) > prev_bbox['y_min'].reshape((1, -1))),
-                    np.logical_and(
-                        new_bbox['x_min'].reshape((-1, 1)) < prev_bbox['x_max'].reshape((1, -1)),
-                        new_bbox['x_max'].reshape((-1, 1)) > prev_bbox['x_min'].reshape((1, -1))))
-
-                for i in range(overlaps.shape[0]):
-                    js = np.flatnonzero(overlaps[i,:])
+                prev_checks = new_checks
+                new_bbox = self._bboxes(new_regions[0], fr)
+                new_checks = self._checks(new_regions[0])
+                if self.engine == ENGINE_OVERLAP:
+                    # Compare label images
+                    overlaps = self._overlap_matrix(fr, prev_regions, new_regions)
+                    prev_pos = np.full(overlaps.shape[1], -1, dtype=np.intp)
+                    prev_pos[prev_bbox['labels'].astype(np.intp)] = np.arange(prev_bbox['n'])
+                else:
+                    # Compare bounding boxes
+                    overlaps = np.logical_and(
+                        np.logical_and(
+                            new_bbox['y_min'].reshape((-1, 1)) < prev_bbox['y_max'].reshape((1, -1)),
+                            new_bbox['y_max'].reshape((-1, 1)) > prev_bbox['y_min'].reshape((1, -1))),
+                        np.logical_and(
+                            new_bbox['x_min'].reshape((-1, 1)) < prev_bbox['x_max'].reshape((1, -1)),
+                            new_bbox['x_max'].reshape((-1, 1)) > prev_bbox['x_min'].reshape((1, -1))))
+
+                for i in range(new_bbox['n']):
+                    if self.engine == ENGINE_OVERLAP:
+                        # Positions of overlapping regions in `prev_bbox`, ordered by label
+                        li = new_bbox['labels'][i]
+                        js = prev_pos[overlaps.indices[overlaps.indptr[li]:overlaps.indptr[li+1]]]
+                        js = js[js >= 0]
+                    else:
+                        js = np.flatnonzero(overlaps[i,:])
 
                     # Continue if ROI has no parent
                     if js.size == 0:
                         continue
 
-                    li = new_bbox['labels'][i]
-                    pi = new_bbox['props'][i]
-                    ci = pi.coords
-
-                    cki = self._get_trace_checks(pi)
+                    ri = new_bbox['index'][i]
+                    cki = new_checks[ri]
                     if cki['ignore']:
                         continue
-                    elif cki['edge']:
-                        is_select = None
-                    elif cki['good']:
-                        is_select = True
-                    else:
-                        is_select = False
-                    new_checks[li] = cki
+                    is_select = self._selection_from_checks(cki)
+                    li = int(cki['label'])
+                    if self.engine == ENGINE_BBOX:
+                        ci = self._coords(new_regions, ri)
 
                     # Compare with regions of previous frame
                     # Check if parent is valid (area, edge)
+                    # `parents` holds rows of `prev_checks`
                     parents = []
                     for j in js:
-                        pj = prev_bbox['props'][j]
-                        lj = pj.label
-                        cj = pj.coords
-                        if not check_coordinate_overlap(ci, cj):
-                            continue
-                        try:
-                            ckj = prev_checks[lj]
-                        except KeyError:
+                        rj = prev_bbox['index'][j]
+                        if self.engine == ENGINE_BBOX and \
+                                not check_coordinate_overlap(ci, self._coords(prev_regions, rj)):
                             continue
-
-                        if ckj['edge']:
+                        if prev_checks['edge'][rj]:
                             is_select = None
                             break
-
-                        parents.append(dict(ckj))
+                        parents.append(rj)
 
                     # Check for parents
-                    parents.sort(key=lambda p: p['area'])
+                    parents.sort(key=lambda r: prev_checks['area'][r])
                     if is_select is None:
                         pass
                     elif not parents:
                         continue
-                    elif parents[0]['ignore']:
+                    elif prev_checks['ignore'][parents[0]]:
                         is_select = None
-                    elif len(parents) > 1 and not parents[1]['ignore']:
+                    elif len(parents) > 1 and not prev_checks['ignore'][parents[1]]:
                         is_select = None
                     else:
                         parent = 0
@@ -283,7 +584,7 @@ class Tracker:
                     if is_select is None:
                         for p in parents:
                             try:
-                                invalid_idx = prev_idx[p['label']]
+                                invalid_idx = prev_idx[int(prev_checks['label'][p])]
                             except KeyError:
                                 continue
                             traces_selection[invalid_idx] = None
@@ -292,15 +593,15 @@ class Tracker:
                     # Final checks
                     parent = parents[parent]
                     try:
-                        trace_idx = prev_idx[parent['label']]
+                        trace_idx = prev_idx[int(prev_checks['label'][parent])]
                     except KeyError:
                         continue
 
                     if traces_selection[trace_idx] is None:
                         # Ignore traces with "bad ancestors"
                         continue
-                    elif any(not new_checks[l]['ignore'] for l, x in new_idx.items() if x == trace_idx):
-                        # Eliminate siblings
+                    elif trace_idx in new_idx.values():
+                        # Eliminate siblings (ignored regions are never registered)
                         traces_selection[trace_idx] = None
                     elif not is_select and traces_selection[trace_idx]:
                         # Propagate deselect
@@ -308,54 +609,96 @@ class Tracker:
                     # Register this region as child of parent
                     new_idx[li] = trace_idx
                     traces[trace_idx].append(li)
+                    if with_regions:
+                        traces_regions[trace_idx].append(self._detached_region(new_regions, ri))
+
+                # Emit traces that are not continued
+                continued = set(new_idx.values())
+                for trace_idx in [x for x in traces if x not in continued]:
+                    if with_regions:
+                        yield traces.pop(trace_idx), traces_selection.pop(trace_idx), traces_regions.pop(trace_idx)
+                    else:
+                        yield traces.pop(trace_idx), traces_selection.pop(trace_idx)
 
                 prev_idx = new_idx
-                prev_checks = new_checks
-                print("Frame {:03d}: {:.4f}s".format(fr + 1, time.time() - tic)) #DEBUG
 
-        # Clean up cells
+        # Emit remaining traces
+        self._last_lbl_img = None
+        for trace_idx in sorted(traces):
+            if with_regions:
+                yield traces[trace_idx], traces_selection[trace_idx], traces_regions[trace_idx]
+            else:
+                yield traces[trace_idx], traces_selection[trace_idx]
+
+    def track(self, with_regions=False):
+        """Track the cells through the stack.
+
+        Only traces spanning the whole stack that are not untrackable
+        are stored in `traces` and `traces_selection`.
+        If `with_regions` is True, the `Region` objects of the traces
+        are stored in `traces_regions`, else it is None.
+        """
         self.traces = []
         self.traces_selection = []
-        for tr, sel in zip(traces, traces_selection):
+        self.traces_regions = [] if with_regions else None
+        for tr, sel, *regions in self.iter_traces(with_regions=with_regions):
             if len(tr) == self.n_frames and sel is not None:
                 self.traces.append(tr)
                 self.traces_selection.append(sel)
-        print(f"Total tracking time: {time.time() - tic0 :.2f}s") #DEBUG
-
-    def _get_trace_checks(self, props, edges=True):
-        is_good = True
-        is_edge = False
-        is_small = False
-        is_large = False
-        is_ignore = False
-        if edges:
-            coords = props.coords
-            if (np.any(coords.flat == 0) or np.any(coords[:,0] == self.height-1) or \
-                    np.any(coords[:,1] == self.width-1)):
-                is_edge = True
-                is_good = False
-        if self.max_size and props.area > self.max_size:
-            is_large = True
-            is_good = False
-        if self.min_size and props.area < self.min_size:
-            is_small = True
-            is_good = False
-            if self.ignore_size and props.area <= self.ignore_size:
-                is_ignore=True
-        return dict(label=props.label,
-                    area=props.area,
-                    good=is_good,
-                    edge=is_edge,
-                    ignore=is_ignore,
-                    small=is_small,
-                    large=is_large)
-
-    def get_traces(self):
+                if with_regions:
+                    self.traces_regions.append(regions[0])
+
+    def retrack(self, **params):
+        """Track the cells again with changed parameters.
+
+        `params` -- new values of `min_size`, `max_size` and/or `ignore_size`
+
+        The region tables and overlap matrices are reused,
+        so that only the linking of regions is repeated.
+        """
+        for name, value in params.items():
+            if name not in ('min_size', 'max_size', 'ignore_size'):
+                raise TypeError(f"Unknown tracking parameter: {name}")
+            setattr(self, name, value)
+        if self.regions is None:
+            self.read_regionprops()
+        self.track()
+
+    def update_frame(self, fr, labels=None):
+        """Track the cells again after frame `fr` has changed.
+
+        `labels` -- new label image of frame `fr`; if not given,
+                    the frame is read again from the stack, which
+                    must not have been closed
+
+        Only the region table of frame `fr` and its overlap matrices
+        with the neighboring frames are recomputed.
+        The label image `labels` is kept by the tracker instead of
+        being written to the stack, and replaces frame `fr` of the
+        stack when the frame is read again.
+        """
+        if self.regions is None:
+            raise ValueError("Region tables must be read before updating a frame.")
+        if labels is None:
+            self._label_images.pop(fr, None)
+        else:
+            self._label_images[fr] = np.asarray(labels)
+        self.regions[fr] = self._read_frame_regions(fr)
+        self._overlaps.pop(fr, None)
+        self._overlaps.pop(fr + 1, None)
+        self.track()
+
+    def get_traces(self, streaming=False):
         """Label and track cells.
 
+        If `streaming` is True, the region tables are not stored
+        in `regions`, but extracted while tracking. Use this for long
+        stacks when only the regions of the traces are needed after
+        tracking; they are stored in `traces_regions`.
+
         This method is intended to be called externally."""
         if self.make_labeled_stack and self.stack_lbl is None:
             self.label_stack()
-        if self.props is None:
+        if self.regions is None and not streaming:
             self.read_regionprops()
-        self.track()
+        self.track(with_regions=streaming)
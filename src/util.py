@@ -16,17 +16,17 @@ def get_fstype(fp):
     """Retrieve filesystem type of file path `fp`"""
     fp = op.abspath(fp)
     parent_mountpoints = {}
-    for p in pu.disk_partitions(all=True):
+    for p in psutil.disk_partitions(all=True):
         if op.samefile(op.commonpath((fp, p.mountpoint)), p.mountpoint):
             parent_mountpoints[p.mountpoint] = p.fstype
-    return max(parent_mountpoints.items(), key=lambda p: len(p[0]))[0]
+    return max(parent_mountpoints.items(), key=lambda p: len(p[0]))[1]
 
 
 def get_disk_temp_dir():
     """Get a directory for temporary files on the disk"""
     td = tempfile.gettempdir()
     if sys.platform.startswith("win"):
-        return td0
+        return td
     elif get_fstype(td) in TEMP_FS_LIST:
         td = '/var/tmp'
         try: